@@ -1,14 +1,49 @@
+import functools
 import json
 import os
+from types import MappingProxyType
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def cache_dir():
+    """directory of the on-disk caches: $ASTOUND_CACHE_DIR if set, otherwise
+    astound under the user cache directory of the platform"""
+    if os.environ.get("ASTOUND_CACHE_DIR"):
+        return os.environ["ASTOUND_CACHE_DIR"]
+    if os.name == "nt":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "astound")
+
+
+def cache_path(path: str):
+    """absolute path of a cache file given in the config, relative to
+    `cache_dir`, which is created if needed"""
+    path = os.path.join(cache_dir(), os.path.expanduser(path))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
 
-import jedi
 
 def load_config():
-    with open("astound/config.json", "r", encoding="utf-8") as config_file:
+    with open(
+        os.path.join(PACKAGE_DIR, "config.json"), "r", encoding="utf-8"
+    ) as config_file:
         config = json.load(config_file)
     return config
 
 
+@functools.lru_cache(maxsize=None)
+def prompts():
+    """the prompt templates in astound/data/prompts.json, read on first use"""
+    with open(
+        os.path.join(PACKAGE_DIR, "data", "prompts.json"), "r", encoding="UTF-8"
+    ) as f:
+        return MappingProxyType(json.load(f))
+
+
 astound_config = load_config()
-jedi.settings.fast_parser = astound_config["jedi"]["fast_parser"]
-claude_model = astound_config["claude_model"]
\ No newline at end of file
+claude_model = astound_config["claude_model"]
+max_concurrency = astound_config["max_concurrency"]
+stream_summaries = astound_config["stream_summaries"]
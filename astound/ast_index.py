@@ -0,0 +1,144 @@
+import ast
+from array import array
+
+from astound.ast_node_utils import ENUM_TYPES
+
+AST_TYPES = tuple(
+    t for t in vars(ast).values() if isinstance(t, type) and issubclass(t, ast.AST)
+)
+TYPE_CODES = {t: code for code, t in enumerate(AST_TYPES)}
+
+NO_POSITION = -1
+POSITION_FIELDS = ("lineno", "col_offset", "end_lineno", "end_col_offset")
+
+
+def _position(ast_node, field):
+    value = getattr(ast_node, field, None)
+    return NO_POSITION if value is None else value
+
+
+class AstIndex:
+    """
+    Flattened view of a parsed module. Every ast node is numbered in preorder and
+    described by parallel arrays (type code, parent, subtree end and location), so
+    that the descendants of node i are exactly the indices in range(i + 1, end[i]).
+    This supports constant-time lookup by (line, col) and ancestry queries without
+    creating wrapper objects.
+    """
+
+    def __init__(self, tree: ast.AST):
+        self.nodes = []
+        self.type_code = array("H")
+        self.parent = array("i")
+        self.end = array("i")
+        self.lineno = array("i")
+        self.col_offset = array("i")
+        self.end_lineno = array("i")
+        self.end_col_offset = array("i")
+        self.by_id = {}  # id(ast node) -> index
+        self.by_position = {}  # (lineno, col_offset) -> indices, outermost first
+
+        stack = [(tree, NO_POSITION)]
+        while stack:
+            ast_node, parent = stack.pop()
+            i = len(self.nodes)
+            self.nodes.append(ast_node)
+            self.by_id[id(ast_node)] = i
+            self.type_code.append(TYPE_CODES[type(ast_node)])
+            self.parent.append(parent)
+            self.end.append(i + 1)
+            lineno, col_offset, end_lineno, end_col_offset = (
+                _position(ast_node, field) for field in POSITION_FIELDS
+            )
+            self.lineno.append(lineno)
+            self.col_offset.append(col_offset)
+            self.end_lineno.append(end_lineno)
+            self.end_col_offset.append(end_col_offset)
+            if lineno != NO_POSITION:
+                self.by_position.setdefault((lineno, col_offset), []).append(i)
+            stack.extend(
+                (child, i)
+                for child in reversed(list(ast.iter_child_nodes(ast_node)))
+                if not isinstance(child, ENUM_TYPES)
+            )
+
+        # preorder numbering: a subtree ends where the last of its descendants ends
+        for i in range(len(self.nodes) - 1, 0, -1):
+            parent = self.parent[i]
+            if self.end[i] > self.end[parent]:
+                self.end[parent] = self.end[i]
+
+    def __getstate__(self):
+        # object ids do not survive pickling; by_id is rebuilt on unpickling
+        state = self.__dict__.copy()
+        del state["by_id"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.by_id = {id(ast_node): i for i, ast_node in enumerate(self.nodes)}
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def index_of(self, ast_node: ast.AST):
+        """preorder index of ast_node, or None if it is not part of this tree"""
+        return self.by_id.get(id(ast_node))
+
+    def at(self, line: int, col: int):
+        """indices of the nodes starting at (line, col), outermost first"""
+        return self.by_position.get((line, col), [])
+
+    def is_descendant(self, ancestor: int, i: int):
+        return ancestor < i < self.end[ancestor]
+
+    def enclosing(self, i: int, ast_type: type):
+        """index of the nearest node of type ast_type that contains node i
+        (including node i itself), or None"""
+        code = TYPE_CODES[ast_type]
+        while i != NO_POSITION:
+            if self.type_code[i] == code:
+                return i
+            i = self.parent[i]
+        return None
+
+
+class DefinitionIndex(ast.NodeVisitor):
+    """Node visitor that records the span of every function and class definition
+    in a module under its qualified name, e.g. 'Cursor.attach', and the names
+    bound by import statements"""
+
+    def __init__(self):
+        self.scope = []
+        self.spans = {}  # qualified name -> (lineno, col, end_lineno, end_col)
+        self.by_name = {}  # unqualified name -> span of its first definition
+        # local name -> imported dotted name, relative imports keep their dots,
+        # e.g. 'np' -> 'numpy', 'Node' -> 'astound.node.Node', 'x' -> '..pkg.x'
+        self.imports = {}
+
+    def visit_definition(self, node):
+        self.scope.append(node.name)
+        span = (node.lineno, node.col_offset, node.end_lineno, node.end_col_offset)
+        self.spans.setdefault(".".join(self.scope), span)
+        self.by_name.setdefault(node.name, span)
+        self.generic_visit(node)
+        self.scope.pop()
+
+    visit_FunctionDef = visit_AsyncFunctionDef = visit_ClassDef = visit_definition
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            if alias.asname:
+                self.imports.setdefault(alias.asname, alias.name)
+            else:
+                # `import a.b` binds `a`
+                head = alias.name.split(".")[0]
+                self.imports.setdefault(head, head)
+
+    def visit_ImportFrom(self, node):
+        module = "." * node.level + (node.module or "")
+        for alias in node.names:
+            if alias.name == "*":
+                continue
+            target = f"{module}.{alias.name}" if node.module else module + alias.name
+            self.imports.setdefault(alias.asname or alias.name, target)
@@ -13,6 +13,13 @@ RICH_TYPES = (
     ast.Name,
 )
 
+# statements that define a name with a body of their own
+DEFINITION_TYPES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+
+# ASDL sum types whose members carry no child nodes worth navigating to. The
+# parser shares one instance of each of these between all nodes that use it.
+ENUM_TYPES = (ast.expr_context, ast.boolop, ast.operator, ast.unaryop, ast.cmpop)
+
 SKIP_TYPES = ast_node_types = {
     ast.Expr: "value",
     ast.Return: "value",
@@ -43,6 +50,27 @@ def skip_type(ast_node: ast.AST):
     return ast_node
 
 
+def is_super_call(ast_node):
+    """true for the `super()` in `super().method()`"""
+    return (
+        isinstance(ast_node, ast.Call)
+        and isinstance(ast_node.func, ast.Name)
+        and ast_node.func.id == "super"
+    )
+
+
+def dotted_name(ast_node):
+    """'a.b.c' for a chain of Name and Attribute nodes, else None"""
+    parts = []
+    while isinstance(ast_node, ast.Attribute):
+        parts.append(ast_node.attr)
+        ast_node = ast_node.value
+    if not isinstance(ast_node, ast.Name):
+        return None
+    parts.append(ast_node.id)
+    return ".".join(reversed(parts))
+
+
 def get_ast_tuplestr(ast_node):
     return f"{ast_node.lineno}, {ast_node.col_offset}"
 
@@ -57,20 +85,36 @@ def pretty_type(t):
 
 def extract_name(node, N=20):
     """return namelike attribute, or source if unavailable"""
-    if not node.ast_node:
+    ast_node = node.ast_node
+    if not ast_node:
         return ""
-    if isinstance(node.ast_node, ast.Call):
-        return extract_name(node.ast_node.func)
+    # a call is named after its callee
+    while isinstance(ast_node, ast.Call):
+        ast_node = ast_node.func
     for alias in ALIASES:
-        if hasattr(node.ast_node, alias):
-            this_alias = getattr(node.ast_node, alias)
+        if hasattr(ast_node, alias):
+            this_alias = getattr(ast_node, alias)
             if not this_alias:
                 return ""
             assert isinstance(this_alias, str)
             return this_alias
-    get_source = astor.to_source(node.ast_node).split("\n")
-    if len(get_source[0]) > N or len(get_source) > 1:
+    first_line, more = first_source_line(ast_node, node.source)
+    if len(first_line) > N or more:
         append = "..."
     else:
         append = ""
-    return f"{get_source[0][:N]}{append}"
+    return f"{first_line[:N]}{append}"
+
+
+def first_source_line(ast_node, source=None):
+    """first line of the source text of ast_node and whether the text continues
+    on later lines. The line is sliced from source by the node's position;
+    nodes without a position or a source are rendered with astor instead."""
+    if source is None or getattr(ast_node, "end_lineno", None) is None:
+        lines = astor.to_source(ast_node).rstrip("\n").split("\n")
+        return lines[0], len(lines) > 1
+    # column offsets are utf-8 byte offsets, see Source.segment
+    line = source.lines[ast_node.lineno - 1].encode()
+    if ast_node.end_lineno == ast_node.lineno:
+        return line[ast_node.col_offset : ast_node.end_col_offset].decode(), False
+    return line[ast_node.col_offset :].decode(), True
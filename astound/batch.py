@@ -0,0 +1,168 @@
+"""
+Summarize every Python file under a directory or package without the
+interactive loop. Run from the repository root:
+
+    python -m astound.batch path/or/package --out summaries.jsonl
+
+Each file becomes a tree of its module, classes and functions (nested
+definitions under the definition that contains them). Files are read, parsed
+and indexed in a process pool, trees are summarized concurrently under the
+shared `max_concurrency` limit at background priority, and one json line per
+file is written as soon as its tree is done. Summaries go through the summary cache, so an interrupted
+run picks up where it stopped and later interactive sessions reuse them.
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from astound import astound_config, max_concurrency
+from astound.ast_node_utils import DEFINITION_TYPES
+from astound.instrument import metrics
+from astound.llm import asyncio_run
+from astound.node import Node, Source
+from astound.scheduler import BACKGROUND, Scheduler, priority, set_scheduler
+from astound.smartparse import discover_types_async
+from astound.summarize import summarize_async
+from astound.symbol_index import python_files
+
+
+def find_files(target: str):
+    """python files under a directory, or under the package or module named by
+    target if it is not a directory"""
+    if not os.path.isdir(target):
+        spec = importlib.util.find_spec(target)
+        if spec is None:
+            raise ValueError(
+                f"{target} is neither a directory nor an importable module"
+            )
+        if not spec.submodule_search_locations:
+            return [spec.origin]
+        target = list(spec.submodule_search_locations)[0]
+
+    return python_files(target)
+
+
+def build_source(path: str):
+    """read, parse and index one file; runs in a worker process"""
+    return Source(path)
+
+
+def definition_tree(source: Source):
+    """
+    Module node of source with every class and function attached under the
+    nearest definition that contains it, keyed by 'line,col' as attach_subnode
+    would.
+
+    Returns:
+        tuple: The module Node and a dict of qualified name -> Node.
+    """
+    index = source.index
+    root = Node.at_position(source, 0)
+    nodes = {0: (root, "")}
+    named = {}
+    for i in range(1, len(index)):
+        ast_node = index.nodes[i]
+        if not isinstance(ast_node, DEFINITION_TYPES):
+            continue
+        parent = index.parent[i]
+        while parent not in nodes:
+            parent = index.parent[parent]
+        parent_node, parent_name = nodes[parent]
+        node = Node.at_position(source, i, parent=parent_node)
+        parent_node.children[f"{ast_node.lineno},{ast_node.col_offset}"] = node
+        name = f"{parent_name}.{ast_node.name}" if parent_name else ast_node.name
+        nodes[i] = (node, name)
+        named.setdefault(name, node)
+    return root, named
+
+
+async def summarize_file(path, build, semaphore):
+    """summarize one file, returning the json record written for it"""
+    try:
+        source = await build
+        # worker processes do not share the subfield table of this one
+        await discover_types_async(source.index)
+        root, named = definition_tree(source)
+        await summarize_async(root, semaphore=semaphore)
+    except Exception as exc:  # one bad file must not end an overnight run
+        logging.warning("failed to summarize %s: %s", path, exc)
+        return {"path": path, "error": f"{type(exc).__name__}: {exc}"}
+    return {
+        "path": path,
+        "module": root.summary,
+        "definitions": {name: node.summary for name, node in named.items()},
+    }
+
+
+async def summarize_files(paths, out, workers=None, max_concurrency=max_concurrency):
+    """
+    Summarize paths, writing one json line per file to the open file out in
+    order of completion.
+
+    Args:
+        paths (list): Python files to summarize.
+        out: Text file to write results to.
+        workers (int): Processes used for parsing, by default one per cpu.
+        max_concurrency (int): Maximum number of requests in flight at once.
+
+    Returns:
+        int: The number of files that failed.
+    """
+    loop = asyncio.get_running_loop()
+    workers = workers or os.cpu_count()
+    semaphore = asyncio.Semaphore(max_concurrency)
+    failed = 0
+    with ProcessPoolExecutor(workers) as pool:
+        # parsed files wait for the model in memory, so only a bounded number
+        # are taken from the pool ahead of the summaries
+        files = asyncio.Semaphore(2 * max(workers, max_concurrency))
+
+        async def run(path):
+            async with files:
+                build = loop.run_in_executor(pool, build_source, path)
+                return await summarize_file(path, build, semaphore)
+
+        for finished in asyncio.as_completed([run(path) for path in paths]):
+            record = await finished
+            failed += "error" in record
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+    return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("target", help="directory, package or module to summarize")
+    parser.add_argument("--out", default="summaries.jsonl")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--max-concurrency", type=int, default=max_concurrency)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+
+    paths = find_files(args.target)
+    start = time.perf_counter()
+    with open(args.out, "w", encoding="utf-8") as out:
+        set_scheduler(
+            Scheduler(args.max_concurrency, **astound_config["llm"]["scheduler"])
+        )
+        with priority(BACKGROUND):
+            failed = asyncio_run(
+                summarize_files(paths, out, args.workers, args.max_concurrency)
+            )
+    print(
+        f"summarized {len(paths) - failed} of {len(paths)} files in "
+        f"{time.perf_counter() - start:.1f} s; results in {args.out}"
+    )
+    print(metrics.report())
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
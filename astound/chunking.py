@@ -0,0 +1,141 @@
+import ast
+import textwrap
+
+from astound import astound_config
+
+# rough average for code and English prose, also used by the stub backend
+CHARS_PER_TOKEN = 4
+
+# nodes whose line ranges are safe places to cut source text
+STATEMENT_TYPES = (ast.stmt, ast.excepthandler, getattr(ast, "match_case", ()))
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def prompt_budget() -> int:
+    """tokens of code or summaries allowed in one request, besides its header"""
+    return astound_config["max_prompt_tokens"]
+
+
+def pack(parts, budget: int, join: str = "\n"):
+    """
+    Group consecutive parts so that each group, joined, fits in budget. A group
+    always takes at least two parts when there are two left, so that repeatedly
+    packing and combining groups is guaranteed to finish.
+
+    Returns:
+        list: Lists of parts, in order.
+    """
+    groups = []
+    group, size = [], 0
+    for part in parts:
+        cost = estimate_tokens(part + join)
+        if len(group) > 1 and size + cost > budget:
+            groups.append(group)
+            group, size = [], 0
+        group.append(part)
+        size += cost
+    if group:
+        groups.append(group)
+    return groups
+
+
+class Chunker:
+    """
+    Splits the lines of a piece of source code into ranges that fit a token
+    budget. Cuts are made at statement boundaries of the outermost block that
+    is too large, descending into a statement only when it alone exceeds the
+    budget, and between lines only when there is no statement left to cut at.
+    """
+
+    def __init__(self, lines, join, budget: int):
+        self.lines = lines
+        self.join = join
+        self.budget = budget
+
+    def cost(self, first: int, last: int):
+        return estimate_tokens(self.join(self.lines[first : last + 1]))
+
+    def spans(self, parent, first: int, last: int):
+        """0-based inclusive line ranges covering first..last, each within budget
+        where possible"""
+        if self.cost(first, last) <= self.budget:
+            return [(first, last)]
+
+        statements = [
+            child
+            for child in (ast.iter_child_nodes(parent) if parent is not None else ())
+            if isinstance(child, STATEMENT_TYPES) and first <= child.lineno - 1 <= last
+        ]
+        # a single statement spanning the whole range, e.g. the def of a function
+        if (
+            len(statements) == 1
+            and statements[0].lineno - 1 == first
+            and statements[0].end_lineno - 1 >= last
+        ):
+            return self.spans(statements[0], first, last)
+
+        cuts = [s.lineno - 1 for s in statements if s.lineno - 1 > first]
+        if not cuts:
+            return self.line_spans(first, last)
+
+        starts = [first, *cuts]
+        ends = [cut - 1 for cut in cuts] + [last]
+        segments = []
+        for start, end in zip(starts, ends):
+            if self.cost(start, end) <= self.budget:
+                segments.append((start, end))
+                continue
+            statement = next((s for s in statements if s.lineno - 1 == start), None)
+            segments.extend(self.spans(statement, start, end))
+        return self.merge(segments)
+
+    def line_spans(self, first: int, last: int):
+        spans = []
+        start = first
+        for i in range(first + 1, last + 1):
+            if self.cost(start, i) > self.budget:
+                spans.append((start, i - 1))
+                start = i
+        spans.append((start, last))
+        return spans
+
+    def merge(self, segments):
+        """join neighbouring segments while they fit together"""
+        merged = [segments[0]]
+        for start, end in segments[1:]:
+            if self.cost(merged[-1][0], end) <= self.budget:
+                merged[-1] = (merged[-1][0], end)
+            else:
+                merged.append((start, end))
+        return merged
+
+
+def chunk_core_text(core_text, budget: int):
+    """
+    Split the output of `Node.core_text` (a list of source lines or a string)
+    into pieces of at most about budget tokens, rendered the same way the whole
+    would be.
+
+    Returns:
+        list: The pieces in order, a single one if the whole fits.
+    """
+    if isinstance(core_text, str):
+        lines, join = core_text.split("\n"), "\n".join
+    else:
+        lines, join = list(core_text), "".join
+    if not lines or estimate_tokens(join(lines)) <= budget:
+        return [join(lines)]
+
+    try:
+        # the lines hold a whole definition or statement, possibly indented
+        tree = ast.parse(textwrap.dedent("\n".join(lines)))
+    except SyntaxError:
+        tree = None
+    chunker = Chunker(lines, join, budget)
+    return [
+        join(lines[first : last + 1])
+        for first, last in chunker.spans(tree, 0, len(lines) - 1)
+    ]
@@ -1,9 +1,11 @@
 import ast
+import os
 from typing import Union
 
-from astound import summarize
+from astound import refresh, stream_summaries, summarize
 from astound.ast_node_utils import pretty_type
 from astound.node import Node, Source
+from astound.registry import source_registry
 
 
 def display_tree(node, tag=""):
@@ -17,8 +19,7 @@ class Cursor:
 
     def __init__(self, root: Union[Source, Node]):
         if isinstance(root, Source):
-            ast_node = ast.parse(root.text)
-            self.root = Node(ast_node=ast_node, source=root)
+            self.root = Node(ast_node=root.tree, source=root)
         else:
             self.root = root
 
@@ -40,6 +41,7 @@ class Cursor:
         """navigate to child node specified by 'key'"""
         self.current = self.current.children[key]
         self.depth += 1
+        source_registry.focus(self.current.source)
 
     def up(self):
         """navigate to parent node"""
@@ -47,6 +49,7 @@ class Cursor:
             return
         self.current = self.current.parent
         self.depth -= 1
+        source_registry.focus(self.current.source)
 
     def attach(self, pathstr: str = None, line: int = None, col: int = None):
         """If path is specified, attach a child node that is not part of the
@@ -55,15 +58,74 @@ class Cursor:
         If line and col are specified, attach a child node that is an ast
         subnode by line, column reference. This behavior wraps Node.attach_subnode."""
         if pathstr:
-            source = Source(pathstr)
-            ast_node = ast.parse(source.text)
+            source = source_registry.get(pathstr)
             self.current.attach_manual(
-                pathstr, Node(ast_node=ast_node, source=source, parent=self.current)
+                pathstr, Node(ast_node=source.tree, source=source, parent=self.current)
             )
         else:
             self.current.attach_subnode(line, col)
 
-    def summarize_down(self):
-        """Recursive summarization of the current node and its attached children."""
-        self.current.summary = summarize.summarize(self.current)
-        print(self.current.summary)
+    def follow(self, line: int = None, col: int = None):
+        """Attach the definition called by the current node, or by its call subnode
+        at line, column, as a child keyed 'path:line,col' and move down to it. The
+        defining Source is located through the project symbol index and opened as
+        if by `attach`."""
+        if line is not None:
+            source = self.current.source
+            index = source.index
+            calls = [
+                i
+                for i in index.at(line, col)
+                if isinstance(index.nodes[i], ast.Call)
+                and index.is_descendant(self.current.ast_position, i)
+            ]
+            if not calls:
+                raise ValueError("no call at (line, col)")
+            call = Node.at_position(source, calls[0])
+        else:
+            call = self.current
+        if not isinstance(call.ast_node, ast.Call):
+            raise ValueError("only calls can be followed")
+        target = call.call_target()
+        if target is None:
+            raise ValueError("definition not found")
+
+        path, (line, col, _, _) = target
+        key = f"{os.path.relpath(path)}:{line},{col}"
+        if key not in self.current.children:
+            source = source_registry.get(path)
+            # the def or class statement is the outermost node starting there
+            position = source.index.at(line, col)[0]
+            self.current.attach_manual(
+                key, Node.at_position(source, position, parent=self.current)
+            )
+        self.down(key)
+
+    def summarize_down(self, stream: bool = stream_summaries):
+        """Recursive summarization of the current node and its attached children.
+        When streaming, each child's summary is printed as it completes and the
+        summary of the current node is printed as it is generated."""
+        if not stream:
+            self.current.summary = summarize.summarize_concurrent(self.current)
+            print(self.current.summary)
+            return
+
+        for event in summarize.summarize_stream(self.current):
+            if event.kind == "child":
+                print(f"[{event.key}] {event.text}\n", flush=True)
+            else:
+                print(event.text, end="", flush=True)
+        print()
+
+    def refresh(self):
+        """Re-read changed sources and re-summarize what they affect, see
+        astound.refresh. If the current node no longer exists, the cursor moves
+        back to the root."""
+        refreshed = refresh.refresh(self.root)
+        node = self.current
+        while node.parent is not None:
+            if node not in node.parent.children.values():
+                self.current, self.depth = self.root, 0
+                break
+            node = node.parent
+        return refreshed
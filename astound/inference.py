@@ -0,0 +1,165 @@
+import logging
+import os
+import sqlite3
+from collections import namedtuple
+
+from astound import astound_config, cache_path
+from astound.instrument import metrics
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS inference_cache (
+    path TEXT,
+    mtime REAL,
+    line INTEGER,
+    col INTEGER,
+    full_name TEXT,
+    name TEXT,
+    module_name TEXT,
+    module_path TEXT,
+    PRIMARY KEY (path, mtime, line, col)
+);
+"""
+
+# the parts of a jedi.api.classes.Name that astound uses, in a form that can be stored
+Inference = namedtuple("Inference", ["full_name", "name", "module_name", "module_path"])
+
+_PROJECT = None
+
+# files or directories that mark the root of a project, as for jedi
+PROJECT_MARKERS = (
+    ".git",
+    ".hg",
+    "setup.py",
+    "setup.cfg",
+    "pyproject.toml",
+    "requirements.txt",
+    "MANIFEST.in",
+)
+
+
+def project_path():
+    """root of the project that contains the working directory: the nearest
+    directory at or above it with a project marker, or the working directory
+    itself if there is none"""
+    cwd = os.getcwd()
+    path = cwd
+    while True:
+        if any(os.path.exists(os.path.join(path, m)) for m in PROJECT_MARKERS):
+            return path
+        parent = os.path.dirname(path)
+        if parent == path:
+            return cwd
+        path = parent
+
+
+def jedi_project():
+    """the jedi.Project shared by every Source in this session"""
+    global _PROJECT
+    if _PROJECT is None:
+        # jedi takes a noticeable share of a second to import, so it is only
+        # imported once something is inferred
+        import jedi
+
+        jedi.settings.fast_parser = astound_config["jedi"]["fast_parser"]
+        _PROJECT = jedi.Project(path=project_path())
+    return _PROJECT
+
+
+class InferenceCache:
+    """
+    Results of jedi inference keyed by (path, mtime, line, col). Lookups are
+    served from memory; results are also written to sqlite so that later sessions
+    can reuse them as long as the file has not been modified. The cache may be
+    used from the prefetch worker thread, but never from two threads at once.
+    """
+
+    def __init__(self, path: str):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+        self.memory = {}
+        self.pruned = set()
+
+    def get(self, key):
+        """returns an Inference, None for a cached miss, or raises KeyError"""
+        if key in self.memory:
+            return self.memory[key]
+        row = self.conn.execute(
+            """SELECT full_name, name, module_name, module_path FROM inference_cache
+            WHERE path = ? AND mtime = ? AND line = ? AND col = ?""",
+            key,
+        ).fetchone()
+        if row is None:
+            raise KeyError(key)
+        self.memory[key] = Inference(*row) if row[1] is not None else None
+        return self.memory[key]
+
+    def put(self, key, inference):
+        self.memory[key] = inference
+        self.conn.execute(
+            "INSERT OR REPLACE INTO inference_cache VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (*key, *(inference or (None,) * len(Inference._fields))),
+        )
+        self.conn.commit()
+
+    def prune(self, path: str, mtime: float):
+        """forget results for earlier versions of the file at path"""
+        if (path, mtime) in self.pruned:
+            return
+        self.conn.execute(
+            "DELETE FROM inference_cache WHERE path = ? AND mtime != ?", (path, mtime)
+        )
+        self.conn.commit()
+        self.pruned.add((path, mtime))
+
+
+_INFERENCE_CACHE = None
+
+
+def get_inference_cache() -> InferenceCache:
+    """the session inference cache, opened on first use"""
+    global _INFERENCE_CACHE
+    if _INFERENCE_CACHE is None:
+        _INFERENCE_CACHE = InferenceCache(
+            cache_path(astound_config["jedi"]["cache_path"])
+        )
+    return _INFERENCE_CACHE
+
+
+def set_inference_cache(cache: InferenceCache):
+    global _INFERENCE_CACHE
+    _INFERENCE_CACHE = cache
+
+
+def infer(source: "Source", line: int, col: int):
+    """
+    Cached equivalent of `source.jedi.infer(line, col)[0]`.
+
+    Returns:
+        Inference: the first inferred name, or None if jedi finds nothing.
+    """
+    path = os.path.abspath(source.path)
+    inference_cache = get_inference_cache()
+    inference_cache.prune(path, source.mtime)
+    key = (path, source.mtime, line, col)
+    try:
+        inference = inference_cache.get(key)
+        metrics.count("jedi.cache_hit")
+        return inference
+    except KeyError:
+        pass
+
+    script = source.jedi
+    try:
+        with metrics.timed("jedi.infer"):
+            ref = script.infer(line, col)[0]
+        inference = Inference(
+            ref.full_name,
+            ref.name,
+            ref.module_name,
+            str(ref.module_path) if ref.module_path else None,
+        )
+    except IndexError:
+        inference = None
+    logging.info("inferred %s:%s,%s as %s", path, line, col, inference)
+    inference_cache.put(key, inference)
+    return inference
@@ -0,0 +1,116 @@
+import json
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+
+class Timing:
+    __slots__ = ("calls", "seconds", "max_seconds")
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+
+    def add(self, seconds: float):
+        self.calls += 1
+        self.seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+
+    def as_dict(self):
+        return {
+            "calls": self.calls,
+            "seconds": round(self.seconds, 6),
+            "max_seconds": round(self.max_seconds, 6),
+        }
+
+
+class TokenUsage:
+    __slots__ = ("input_tokens", "output_tokens")
+
+    def __init__(self):
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+    def as_dict(self):
+        return {"input_tokens": self.input_tokens, "output_tokens": self.output_tokens}
+
+
+class Metrics:
+    """
+    Per-session registry of where time goes. Operations are timed under dotted
+    names (e.g. 'llm.joint', 'jedi.infer', 'ast.parse'), cheap events are only
+    counted (e.g. 'parser_type_query.hit'), and language model token usage is
+    accumulated per prompt.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.timings = defaultdict(Timing)
+        self.counters = defaultdict(int)
+        self.tokens = defaultdict(TokenUsage)
+        self.started = time.time()
+
+    def add(self, operation: str, seconds: float):
+        self.timings[operation].add(seconds)
+
+    def count(self, event: str, n: int = 1):
+        self.counters[event] += n
+
+    @contextmanager
+    def timed(self, operation: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(operation, time.perf_counter() - start)
+
+    def record_llm(
+        self, prompt: str, seconds: float, input_tokens: int, output_tokens: int
+    ):
+        self.add(f"llm.{prompt}", seconds)
+        usage = self.tokens[prompt]
+        usage.input_tokens += input_tokens
+        usage.output_tokens += output_tokens
+
+    def as_dict(self):
+        return {
+            "session_seconds": round(time.time() - self.started, 3),
+            "timings": {k: v.as_dict() for k, v in sorted(self.timings.items())},
+            "counters": dict(sorted(self.counters.items())),
+            "tokens": {k: v.as_dict() for k, v in sorted(self.tokens.items())},
+        }
+
+    def dump(self, path: str):
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.as_dict(), file, indent=2)
+
+    def report(self):
+        lines = [
+            f"{'operation':32}{'calls':>8}{'total s':>10}{'mean ms':>10}{'max ms':>10}"
+        ]
+        for operation, timing in sorted(self.timings.items()):
+            mean = 1000 * timing.seconds / timing.calls if timing.calls else 0.0
+            lines.append(
+                f"{operation:32}{timing.calls:>8}{timing.seconds:>10.3f}"
+                f"{mean:>10.2f}{1000 * timing.max_seconds:>10.2f}"
+            )
+        if self.counters:
+            lines.append("")
+            lines.append(f"{'event':32}{'count':>8}")
+            lines.extend(
+                f"{event:32}{n:>8}" for event, n in sorted(self.counters.items())
+            )
+        if self.tokens:
+            lines.append("")
+            lines.append(f"{'prompt':32}{'input tok':>12}{'output tok':>12}")
+            lines.extend(
+                f"{prompt:32}{usage.input_tokens:>12}{usage.output_tokens:>12}"
+                for prompt, usage in sorted(self.tokens.items())
+            )
+        return "\n".join(lines)
+
+
+metrics = Metrics()
@@ -0,0 +1,330 @@
+import asyncio
+import contextlib
+import hashlib
+import itertools
+import os
+import random
+import time
+from collections import namedtuple
+
+from astound import astound_config
+from astound.chunking import estimate_tokens
+from astound.instrument import metrics
+from astound.scheduler import ThrottledError, TransientError, get_scheduler
+from astound.singleflight import SingleFlight
+
+
+class BackendError(Exception):
+    pass
+
+
+# text of a completion and the tokens it consumed
+Completion = namedtuple("Completion", ["text", "input_tokens", "output_tokens"])
+
+
+class Backend:
+    """
+    Interface for language model access. Every request astound makes goes through
+    `complete` or `complete_async` with a single user prompt, a label naming the
+    prompt for instrumentation, and the message keyword arguments of the caller
+    (model, max_tokens, temperature, system). Subclasses implement `send` and
+    `send_async`.
+
+    Identical requests (same prompt and message keyword arguments) that are in
+    flight at the same time are sent once, and every caller gets the answer.
+    Requests are admitted by the process scheduler, see astound.scheduler, and
+    retried there when `send` raises TransientError.
+    """
+
+    def __init__(self):
+        self.flight = SingleFlight("llm")
+
+    def send(self, prompt: str, **message_kwargs) -> Completion:
+        raise NotImplementedError
+
+    async def send_async(self, prompt: str, **message_kwargs) -> Completion:
+        raise NotImplementedError
+
+    async def aclose(self):
+        """release what the backend holds for the running event loop; every
+        entry point that runs a loop calls this before the loop ends"""
+
+    async def send_stream_async(self, prompt: str, **message_kwargs):
+        """yield the text of the completion in pieces and then the Completion
+        itself. Backends without streaming deliver the text in one piece."""
+        completion = await self.send_async(prompt, **message_kwargs)
+        yield completion.text
+        yield completion
+
+    def complete(self, prompt: str, label: str = "request", **message_kwargs) -> str:
+        scheduler = get_scheduler()
+
+        def request():
+            for attempt in itertools.count():
+                try:
+                    with scheduler.slot(input_tokens(prompt, message_kwargs)):
+                        start = time.perf_counter()
+                        completion = self.send(prompt, **message_kwargs)
+                    break
+                except TransientError as exc:
+                    delay = scheduler.backoff(exc, attempt)
+                    if delay is None:
+                        raise
+                    time.sleep(delay)
+            metrics.record_llm(label, time.perf_counter() - start, *completion[1:])
+            return completion.text
+
+        return self.flight.do(request_key(prompt, message_kwargs), request)
+
+    async def complete_async(
+        self, prompt: str, label: str = "request", limiter=None, **message_kwargs
+    ) -> str:
+        """
+        Args:
+            limiter: Optional async context manager, e.g. a semaphore, held
+                while the request is sent. Callers that share an identical
+                request in flight do not take it.
+        """
+
+        scheduler = get_scheduler()
+
+        async def request():
+            for attempt in itertools.count():
+                try:
+                    async with limiter or contextlib.nullcontext():
+                        async with scheduler.slot_async(
+                            input_tokens(prompt, message_kwargs)
+                        ):
+                            start = time.perf_counter()
+                            completion = await self.send_async(prompt, **message_kwargs)
+                    break
+                except TransientError as exc:
+                    delay = scheduler.backoff(exc, attempt)
+                    if delay is None:
+                        raise
+                    await asyncio.sleep(delay)
+            metrics.record_llm(label, time.perf_counter() - start, *completion[1:])
+            return completion.text
+
+        return await self.flight.do_async(request_key(prompt, message_kwargs), request)
+
+    async def stream_async(self, prompt: str, label: str = "request", **message_kwargs):
+        """async generator over the pieces of text of a completion as they arrive.
+        A request is only retried if it failed before its first piece."""
+        scheduler = get_scheduler()
+        for attempt in itertools.count():
+            started = False
+            try:
+                async with scheduler.slot_async(input_tokens(prompt, message_kwargs)):
+                    start = time.perf_counter()
+                    async for piece in self.send_stream_async(prompt, **message_kwargs):
+                        if isinstance(piece, Completion):
+                            metrics.record_llm(
+                                label, time.perf_counter() - start, *piece[1:]
+                            )
+                        else:
+                            started = True
+                            yield piece
+                return
+            except TransientError as exc:
+                delay = None if started else scheduler.backoff(exc, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+
+
+def asyncio_run(coroutine):
+    """asyncio.run(coroutine), closing the clients of the backend for that loop
+    before it ends"""
+
+    async def main():
+        try:
+            return await coroutine
+        finally:
+            await get_backend().aclose()
+
+    return asyncio.run(main())
+
+
+def input_tokens(prompt: str, message_kwargs):
+    """estimated input tokens of a request, charged against the rate limit"""
+    return estimate_tokens(prompt + message_kwargs.get("system", ""))
+
+
+def request_key(prompt: str, message_kwargs):
+    """identity of a request: the prompt plus model, system prompt and the rest"""
+    return (prompt, tuple(sorted(message_kwargs.items())))
+
+
+def _completion(response):
+    return Completion(
+        response.content[0].text,
+        response.usage.input_tokens,
+        response.usage.output_tokens,
+    )
+
+
+def _retry_after(exc):
+    headers = getattr(getattr(exc, "response", None), "headers", {})
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+@contextlib.contextmanager
+def _api_errors():
+    """translate the errors of the anthropic client that are worth retrying"""
+    import anthropic
+
+    try:
+        yield
+    except anthropic.RateLimitError as exc:
+        raise ThrottledError(str(exc), _retry_after(exc)) from exc
+    except anthropic.APIStatusError as exc:
+        # 529: the API is overloaded
+        if exc.status_code == 529:
+            raise ThrottledError(str(exc), _retry_after(exc)) from exc
+        if exc.status_code >= 500:
+            raise TransientError(str(exc), _retry_after(exc)) from exc
+        raise
+    except anthropic.APIConnectionError as exc:
+        raise TransientError(str(exc)) from exc
+
+
+class AnthropicBackend(Backend):
+    """Anthropic Messages API. Requires the ANTHROPIC_API_KEY env variable. The
+    anthropic package is imported with the first request, as importing it takes
+    longer than starting astound otherwise does. The client does not retry by
+    itself; retries are left to the scheduler, which sees every request."""
+
+    def __init__(self):
+        super().__init__()
+        self.client = None
+        self.async_clients = {}  # event loop -> AsyncAnthropic
+
+    def send(self, prompt: str, **message_kwargs) -> Completion:
+        if self.client is None:
+            import anthropic
+
+            self.client = anthropic.Anthropic(max_retries=0)
+        with _api_errors():
+            response = self.client.messages.create(
+                **message_kwargs, messages=[{"role": "user", "content": prompt}]
+            )
+        return _completion(response)
+
+    def async_client(self):
+        # async clients hold connections bound to the loop they were created on
+        loop = asyncio.get_running_loop()
+        if loop not in self.async_clients:
+            import anthropic
+
+            self.async_clients[loop] = anthropic.AsyncAnthropic(max_retries=0)
+        return self.async_clients[loop]
+
+    async def aclose(self):
+        client = self.async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.close()
+
+    async def send_async(self, prompt: str, **message_kwargs) -> Completion:
+        with _api_errors():
+            response = await self.async_client().messages.create(
+                **message_kwargs, messages=[{"role": "user", "content": prompt}]
+            )
+        return _completion(response)
+
+    async def send_stream_async(self, prompt: str, **message_kwargs):
+        with _api_errors():
+            async with self.async_client().messages.stream(
+                **message_kwargs, messages=[{"role": "user", "content": prompt}]
+            ) as stream:
+                async for text in stream.text_stream:
+                    yield text
+                yield _completion(await stream.get_final_message())
+
+
+class StubBackend(Backend):
+    """
+    Offline stand-in that answers deterministically from a hash of the request,
+    after a configurable delay. A configurable fraction of requests fails with
+    BackendError, and another is throttled with ThrottledError as if the rate
+    limit had been hit. Used for benchmarks, load tests and CI. Token counts are
+    estimated at four characters per token.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        failure_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        seed: int = 0,
+    ):
+        super().__init__()
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.throttle_rate = throttle_rate
+        self.random = random.Random(seed)
+        self.calls = 0
+
+    def respond(self, prompt: str, **message_kwargs) -> Completion:
+        self.calls += 1
+        draw = self.random.random()
+        if draw < self.failure_rate:
+            raise BackendError("injected stub failure")
+        if draw < self.failure_rate + self.throttle_rate:
+            raise ThrottledError("injected stub throttling")
+        digest = hashlib.sha256(
+            repr((prompt, sorted(message_kwargs.items()))).encode("utf-8")
+        ).hexdigest()
+        text = f"Stub summary {digest[:12]} of a {len(prompt)} character prompt."
+        input_chars = len(prompt) + len(message_kwargs.get("system", ""))
+        return Completion(text, input_chars // 4, len(text) // 4)
+
+    def delay(self):
+        return max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+
+    def send(self, prompt: str, **message_kwargs) -> Completion:
+        time.sleep(self.delay())
+        return self.respond(prompt, **message_kwargs)
+
+    async def send_async(self, prompt: str, **message_kwargs) -> Completion:
+        await asyncio.sleep(self.delay())
+        return self.respond(prompt, **message_kwargs)
+
+    async def send_stream_async(self, prompt: str, **message_kwargs):
+        # the delay is spread over the words of the answer
+        delay = self.delay()
+        completion = self.respond(prompt, **message_kwargs)
+        words = completion.text.split(" ")
+        for i, word in enumerate(words):
+            await asyncio.sleep(delay / len(words))
+            yield word if i == 0 else " " + word
+        yield completion
+
+
+BACKENDS = {"anthropic": AnthropicBackend, "stub": StubBackend}
+
+_BACKEND = None
+
+
+def make_backend(name: str) -> Backend:
+    return BACKENDS[name](**astound_config["llm"].get(name, {}))
+
+
+def get_backend() -> Backend:
+    """the session backend, chosen by the ASTOUND_LLM_BACKEND env variable or
+    else by `llm.backend` in the config"""
+    global _BACKEND
+    if _BACKEND is None:
+        name = os.environ.get("ASTOUND_LLM_BACKEND", astound_config["llm"]["backend"])
+        _BACKEND = make_backend(name)
+    return _BACKEND
+
+
+def set_backend(backend: Backend):
+    global _BACKEND
+    _BACKEND = backend
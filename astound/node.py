@@ -1,48 +1,216 @@
 import ast
+import hashlib
+import linecache
 import logging
-import sqlite3
+import os
+import time
 
-import anthropic
 import astor
-import jedi
 
 import astound.ast_node_utils as au
+from astound.ast_index import AstIndex, DefinitionIndex
+from astound.inference import infer, jedi_project
+from astound.instrument import metrics
 from astound.smartparse import parser_type_query
+from astound.symbol_index import get_symbol_index, resolve_import
 
 
-class ExtractFunctionSource(ast.NodeVisitor):
-    """Node visitor to extract the text of a function definition
-    given only the function name"""
+def digest(*texts):
+    return hashlib.sha256("\0".join(texts).encode("utf-8")).hexdigest()
 
-    def __init__(self, target_function_name, source):
-        self.target_function_name = target_function_name
-        self.source = source
-        self.function_def = None
 
-    def visit_FunctionDef(self, node):
-        if node.name == self.target_function_name:
-            assert not self.function_def
-            self.function_def = ast.get_source_segment(self.source.text, node)
-        self.generic_visit(node)
+# state that Source builds from its text and can drop when memory is tight
+HEAVY_ATTRIBUTES = (
+    "lines",
+    "tree",
+    "index",
+    "definitions",
+    "definitions_by_name",
+    "imports",
+    "jedi_script",
+    "inheritance_cache",
+)
+
+
+# rough cost of one parsed node including its index entries, for memory budgeting
+AST_NODE_BYTES = 500
+
+
+def segment(lines, lineno, col_offset, end_lineno, end_col_offset):
+    """The text of a span of lines without line endings, as ast.get_source_segment.
+    Column offsets are utf-8 byte offsets, following ast conventions."""
+    lines = lines[lineno - 1 : end_lineno]
+    if lineno == end_lineno:
+        return lines[0].encode()[col_offset:end_col_offset].decode()
+    first = lines[0].encode()[col_offset:].decode()
+    last = lines[-1].encode()[:end_col_offset].decode()
+    return "\n".join([first, *lines[1:-1], last])
+
+
+def file_segment(path, lineno, col_offset, end_lineno, end_col_offset):
+    """`segment` of the file at path, read through linecache rather than parsed;
+    the cached lines are re-read if the file has changed"""
+    linecache.checkcache(path)
+    lines = linecache.getlines(path)[lineno - 1 : end_lineno]
+    lines = [line[:-1] if line.endswith("\n") else line for line in lines]
+    return segment(lines, 1, col_offset, 1 + end_lineno - lineno, end_col_offset)
 
 
 class Source:
-    """mutable wrapper around source text"""
+    """mutable wrapper around source text, its parsed tree and an index of the
+    definitions it contains"""
 
     def __init__(self, path):
         with open(path, "r", encoding="utf-8") as file:
             self.text = file.read()
         self.path = path
-        self.jedi = jedi.Script(self.text)
+        self.mtime = os.path.getmtime(path)
+        self.load()
+
+    def __getattr__(self, name):
+        # only reached when regular lookup fails, i.e. after `unload`
+        if name in HEAVY_ATTRIBUTES:
+            self.load()
+            return getattr(self, name)
+        raise AttributeError(name)
+
+    def load(self):
+        """(re)build the parsed tree, its indexes and the split lines from the text.
+        Parsing is deterministic, so Nodes that refer to the tree by preorder
+        position remain valid across an unload and reload."""
+        self.generation = getattr(self, "generation", 0) + 1
+        self.jedi_script = None
+        self.inheritance_cache = {}  # position of a class -> its parent class name
+        self.lines = self.text.split("\n")
+        with metrics.timed("ast.parse"):
+            self.tree = ast.parse(self.text)
+        with metrics.timed("ast.index"):
+            index = DefinitionIndex()
+            index.visit(self.tree)
+            self.definitions = index.spans
+            self.definitions_by_name = index.by_name
+            self.imports = index.imports
+            self.index = AstIndex(self.tree)
+
+    def unload(self):
+        """drop the state built by `load` and any jedi script; both are rebuilt on
+        next access"""
+        for name in HEAVY_ATTRIBUTES:
+            self.__dict__.pop(name, None)
+
+    def loaded(self):
+        return "tree" in self.__dict__
+
+    def heavy_size(self):
+        """estimated bytes held by the state that `unload` would release. The text
+        itself is kept, so that a reload parses the same tree, and not counted."""
+        if not self.loaded():
+            return 0
+        return sum(map(len, self.lines)) + len(self.index) * AST_NODE_BYTES
+
+    @property
+    def jedi(self):
+        """jedi.Script for this source, created on first use"""
+        if self.jedi_script is None:
+            project = jedi_project()
+            import jedi  # deferred with the rest of jedi, see jedi_project
+
+            with metrics.timed("jedi.script"):
+                self.jedi_script = jedi.Script(self.text, project=project)
+        return self.jedi_script
 
     def view_text(self, line_start, line_end):
         """Return the text of the current node with 1-start line numbers."""
-        source_list = self.text.split("\n")[line_start - 1 : line_end]
+        source_list = self.lines[line_start - 1 : line_end]
         source_list = [
             f"{line_start + i:5}   {txt}" for i, txt in enumerate(source_list)
         ]
         return "\n".join(source_list)
 
+    def segment(self, lineno, col_offset, end_lineno, end_col_offset):
+        """Equivalent of ast.get_source_segment that does not re-split the text"""
+        return segment(self.lines, lineno, col_offset, end_lineno, end_col_offset)
+
+    def inheritance(self, ast_position: int):
+        """
+        Parent class name of the nearest ClassDef enclosing the node at
+        ast_position (possibly the node itself), '' for a class without bases, or
+        None outside any class. The answer is memoized per class, so nodes of
+        the same class share a single lookup.
+        """
+        i = self.index.enclosing(ast_position, ast.ClassDef)
+        if i is None:
+            return None
+        if i not in self.inheritance_cache:
+            self.inheritance_cache[i] = self.first_base(self.index.nodes[i])
+        return self.inheritance_cache[i]
+
+    def first_base(self, class_def: ast.ClassDef):
+        if len(class_def.bases) > 1:
+            logging.warning(
+                "astound cannot resolve multiple inheritance. Defaulting to first parent class."
+            )
+        if not class_def.bases:
+            return ""
+        base = class_def.bases[0]
+        return self.segment(
+            base.lineno, base.col_offset, base.end_lineno, base.end_col_offset
+        ).split("\n", maxsplit=1)[0]
+
+    def definition_span(self, full_name: str):
+        """
+        Return the span of the definition named by a dotted name such as jedi's
+        'package.module.Class.method', or None. The longest suffix of the name
+        that is a qualified name in this module wins; failing that, the first
+        definition with a matching unqualified name is used.
+        """
+        parts = full_name.split(".")
+        for i in range(len(parts)):
+            span = self.definitions.get(".".join(parts[i:]))
+            if span:
+                return span
+        return self.definitions_by_name.get(parts[-1])
+
+    def find_definition(self, full_name: str):
+        """source text of the definition found by `definition_span`, or None"""
+        span = self.definition_span(full_name)
+        return self.segment(*span) if span else None
+
+
+class LazySplit:
+    """Replayable view of a `Node.iter_split` generator. Components are pulled
+    from the generator only when iteration reaches them and are kept, so a
+    partial iteration does not expand the rest and a repeated one does not
+    expand anything. If the generator raises, the error propagates and the
+    split is marked failed, so that `Node.split` builds a fresh one instead of
+    replaying a truncated list."""
+
+    def __init__(self, generator):
+        self.generator = generator
+        self.components = []
+        self.failed = False
+
+    def __iter__(self):
+        i = 0
+        while True:
+            if i < len(self.components):
+                yield self.components[i]
+                i += 1
+            elif self.generator is None:
+                return
+            else:
+                start = time.perf_counter()
+                try:
+                    self.components.append(next(self.generator))
+                except StopIteration:
+                    self.generator = None
+                except BaseException:
+                    self.generator = None
+                    self.failed = True
+                    raise
+                finally:
+                    metrics.add("split.expand", time.perf_counter() - start)
+
 
 class Node:
     """
@@ -64,19 +232,52 @@ class Node:
          attributes, varying by the type of self.ast_node.
     """
 
-    # TODO: replace with context managers external to this class. Can't come up with a good
-    # solution consistent with jupyter notebook user interface...
-    sqlite_conn = sqlite3.connect("data/subfield_store.db")
-    anthropic_client = anthropic.Anthropic()  # requires ANTHROPIC_API_KEY env variable
+    __slots__ = (
+        "source",
+        "ast_position",
+        "detached_ast_node",
+        "text",
+        "parent",
+        "children",
+        "summary",
+        "span_hash",
+        "children_hash",
+        "split_cache",
+        "split_generation",
+        "render_cache",
+    )
 
     def __init__(self, ast_node: ast.AST = None, source: Source = None, parent=None):
-        self.ast_node = au.skip_type(ast_node)
-        self.text = ""
+        ast_node = au.skip_type(ast_node)
         self.source = source
+        # nodes of a Source refer to their ast node by preorder position so that
+        # the source can drop and rebuild its tree without invalidating them
+        self.ast_position = (
+            source.index.index_of(ast_node)
+            if source is not None and ast_node is not None
+            else None
+        )
+        self.detached_ast_node = ast_node if self.ast_position is None else None
+        self.text = ""
         self.parent = parent
         self.children = {}
         self.summary = ""
-        self.inheritance = self.infer_inheritance()
+        self.span_hash = None
+        self.children_hash = None
+        self.split_cache = {}
+        self.split_generation = None
+        self.render_cache = {}  # see `rendered`
+
+    @classmethod
+    def at_position(cls, source: Source, ast_position: int, parent=None):
+        """node for the ast node at a preorder position of source"""
+        return cls(source.index.nodes[ast_position], source=source, parent=parent)
+
+    @property
+    def ast_node(self):
+        if self.ast_position is None:
+            return self.detached_ast_node
+        return self.source.index.nodes[self.ast_position]
 
     def __repr__(self):
         """If a node is not a rich type, display its components. Plus a bit of
@@ -84,6 +285,9 @@ class Node:
 
         if self.ast_node is None:
             return None
+        return self.rendered("repr", self.render_repr)
+
+    def render_repr(self):
         if isinstance(self.ast_node, ast.Module):
             return f"{au.pretty_type(type(self.ast_node))} '{self.name()}'"
         return "\n".join(
@@ -94,11 +298,31 @@ class Node:
             ]
         )
 
+    def rendered(self, key: str, render):
+        """
+        Text displayed for this node by the cursor, rendered once and then reused.
+        It only depends on the source and on the attached children, so the cache
+        is cleared when children are attached or the node is moved onto a new
+        version of its source (see astound.refresh).
+
+        Args:
+            key (str): Which text, e.g. 'repr' or 'children'.
+            render (callable): Produces the text on a miss.
+        """
+        metrics.count(
+            "render.cache_hit" if key in self.render_cache else "render.cache_miss"
+        )
+        if key not in self.render_cache:
+            self.render_cache[key] = render()
+        return self.render_cache[key]
+
     def split(self, tag: str = " ", max_depth: int = 2):
         """
         Recursively simplifies AST nodes that are not "rich types" (as defined in
-        astound/ast_node_utils). Breaks up nodes and returns a list of their
-        relevant components.
+        astound/ast_node_utils). Breaks up nodes and returns their relevant
+        components. The components are expanded lazily and remembered per
+        (tag, max_depth), so repeated listings and lookups on the same node reuse
+        the work already done.
 
         Args:
             tag (str): A string that is edited to display recursion performed at
@@ -107,42 +331,57 @@ class Node:
                 will be returned if max_depth equals 0.
 
         Returns:
-            List[tuple]: A list of tuples, each containing a Node and its
+            LazySplit: An iterable of tuples, each containing a Node and its
             corresponding tag, for each component simplified.
         """
+        # a partially expanded split holds ast nodes of the tree it started on
+        generation = self.source.generation if self.source is not None else 0
+        if generation != self.split_generation:
+            self.split_cache = {}
+            self.split_generation = generation
+
+        key = (tag, max_depth)
+        cached = self.split_cache.get(key)
+        hit = cached is not None and not cached.failed
+        metrics.count("split.cache_hit" if hit else "split.cache_miss")
+        if not hit:
+            self.split_cache[key] = LazySplit(self.iter_split(tag, max_depth))
+        return self.split_cache[key]
+
+    def iter_split(self, tag: str = " ", max_depth: int = 2):
+        """generator behind `split`, yielding (Node, tag) tuples"""
 
         if not self.ast_node:
-            return []
+            return
         if max_depth == 0:
-            return [(self, tag + " truncated at")]
-
-        components = []  # (ast node, relationship annotation)
+            yield (self, tag + " truncated at")
+            return
 
         self_type = au.pretty_type(self.ast_node)
-        field_list = parser_type_query(
-            self.ast_node, self.anthropic_client, self.sqlite_conn
-        ).split(",")
-        field_list = [x for x in field_list if x]
+        field_list = parser_type_query(self.ast_node)
 
         for field in field_list:
             this_attr = getattr(self.ast_node, field)
+            if this_attr is None:
+                continue
             if not isinstance(this_attr, list):
                 this_attr = [this_attr]
-            if this_attr and not isinstance(this_attr[0], ast.AST):
-                logging.warning("Encountered non-AST field %s", field)
-                continue
+            # identifiers, constants and operators have nothing to split
+            this_attr = [
+                x
+                for x in this_attr
+                if isinstance(x, ast.AST) and not isinstance(x, au.ENUM_TYPES)
+            ]
 
             for subnode in this_attr:
                 if au.is_rich_type(self.ast_node):
                     use_depth = 0
                 else:
                     use_depth = max_depth - 1
-                components.extend(
-                    Node(subnode).split(tag + f" {self_type}.{field} >>", use_depth)
+                yield from Node(subnode, source=self.source).iter_split(
+                    tag + f" {self_type}.{field} >>", use_depth
                 )
 
-        return components
-
     def name(self):
         """many ast.AST types have a name-like field but where it is stored
         varies"""
@@ -153,37 +392,29 @@ class Node:
             return self.source.path
         return au.extract_name(self)
 
-    def infer_inheritance(self):
+    @property
+    def inheritance(self):
         """
         Tracks class inheritance when neither the 'ast' nor 'jedi' libraries can
         effectively determine it.
 
-        This method maintains a record of any base classes associated with a given
-        class. If 'self.ast_node' is an instance of 'ClassDef', it infers the parent
-        class name directly from the source text. If 'self.ast_node' is not a
-        'ClassDef', it recursively checks the inheritance chain to find any parent classes.
+        The parent class name of the nearest 'ClassDef' enclosing 'self.ast_node'
+        (possibly the node itself) is read directly from the source text. It is
+        only resolved when asked for, and the source memoizes it per class, see
+        `Source.inheritance`.
 
         Note:
-            This method assumes there is only one parent class because it does not execute
+            This assumes there is only one parent class because it does not execute
             Python's import statements, thus bypassing the standard module and class
             resolution mechanisms that would be available at runtime.
 
         Returns:
-            str: The name of the parent class if 'self.ast_node' is a 'ClassDef', or the
-            nearest parent node that is a 'ClassDef'.
+            str: The name of the parent class of the nearest enclosing 'ClassDef', or
+            None if the node is not inside a class.
         """
-
-        if not isinstance(self.ast_node, ast.ClassDef):
-            if self.parent:
-                return self.parent.infer_inheritance()
+        if self.ast_position is None:
             return None
-        if len(self.ast_node.bases) > 1:
-            logging.warning(
-                "astound cannot resolve multiple inheritance. Defaulting to first parent class."
-            )
-        if not self.ast_node.bases:
-            return ""
-        return astor.to_source(self.ast_node.bases[0]).split("\n", maxsplit=1)[0]
+        return self.source.inheritance(self.ast_position)
 
     def get_subnode(self, line: int, col: int):
         """
@@ -193,32 +424,32 @@ class Node:
         Returns:
             ast.AST: ast_node at that line, column
         """
-        for subnode, _ in self.split():
-            try:
-                if (
-                    subnode.ast_node.lineno == line
-                    and subnode.ast_node.col_offset == col
-                ):
+        index = self.source.index
+        candidates = {
+            i for i in index.at(line, col) if index.is_descendant(self.ast_position, i)
+        }
+        if candidates:
+            # several nodes can start at the same position, e.g. a call and its
+            # callee; the one meant is the one listed among the components
+            for subnode, _ in self.split():
+                if subnode.ast_position in candidates:
                     return subnode.ast_node
-            except AttributeError:
-                logging.warning(
-                    "Bypassing node of type %s, no location info",
-                    au.pretty_type(type(subnode.ast_node)),
-                )
         raise ValueError("(line, col) referenced invalid")
 
     def print_unattached_subnodes(self):
-        out_str = ""
-
         if self.ast_node is None:
-            return out_str
+            return ""
+        return self.rendered("unattached", self.render_unattached_subnodes)
 
+    def render_unattached_subnodes(self):
+        out_str = ""
         for subnode, tag in self.split():
             try:
-                if au.get_ast_tuplestr(subnode.ast_node) not in self.children:
-                    out_str += f"{tag} {subnode}\n"
+                key = f"{subnode.ast_node.lineno},{subnode.ast_node.col_offset}"
             except AttributeError:
-                pass
+                continue
+            if key not in self.children:
+                out_str += f"{tag} {subnode}\n"
         return out_str
 
     def attach_subnode(self, line: int, col: int):
@@ -230,26 +461,89 @@ class Node:
         self.children[f"{line},{col}"] = Node(
             self.get_subnode(line, col), source=self.source, parent=self
         )
+        self.render_cache = {}
+
+    def record_summary(self, summary: str, core_text: str):
+        """store a summary together with hashes of what it was made from: the
+        core text of this node and the summaries of its children"""
+        self.summary = summary
+        self.span_hash = digest(core_text)
+        self.children_hash = digest(*(x.summary for x in self.children.values()))
+
+    def summary_inputs_changed(self):
+        """true if the core text or the child summaries differ from those the
+        current summary was made from"""
+        return self.span_hash != digest("".join(self.core_text())) or (
+            self.children_hash != digest(*(x.summary for x in self.children.values()))
+        )
 
     def attach_manual(self, name: str, node):
         """add a node that is not part of the AST to the children attribute
         under `key`"""
         self.children[name] = node
+        self.render_cache = {}
 
     def print_children(self):
         if not self.children:
             return "   None"
+        return self.rendered("children", self.render_children)
 
+    def render_children(self):
         out_str = ""
         for key, value in self.children.items():
             out_str += f"{value} at key '{key}'"
 
         return out_str
 
+    def call_target(self):
+        """
+        Locate the definition called by an ast.Call node. Names defined or
+        imported at module level are resolved through the project symbol index
+        without running jedi; other callees, e.g. methods of local variables,
+        are inferred with jedi and then looked up in the index.
+
+        Returns:
+            tuple: (path, span) of the definition, or None if it was not found.
+        """
+        func = self.ast_node.func
+        source = self.source
+        name = au.dotted_name(func)
+        if name is not None:
+            head, _, rest = name.partition(".")
+            if name in source.definitions:
+                return source.path, source.definitions[name]
+            if head in source.imports:
+                symbol_index = get_symbol_index()
+                module = symbol_index.module_of(source.path)
+                if module is not None or not source.imports[head].startswith("."):
+                    target = ".".join(x for x in (source.imports[head], rest) if x)
+                    is_package = os.path.basename(source.path) == "__init__.py"
+                    hit = symbol_index.lookup(
+                        resolve_import(target, module or "", is_package)
+                    )
+                    if hit is not None:
+                        return hit
+
+        # infer on the last character of the callee so that `obj.method()`
+        # resolves `method` rather than `obj`
+        inference = infer(source, func.end_lineno, func.end_col_offset - 1)
+        if inference is None:
+            return None
+        full_name = inference.full_name or inference.name
+        # jedi reports definitions in the script itself as module '__main__'
+        if inference.module_name == "__main__":
+            span = source.definition_span(full_name)
+            return (source.path, span) if span else None
+        if inference.module_path is None:
+            return None
+        return get_symbol_index().lookup_external(
+            full_name, str(inference.module_path), inference.module_name
+        )
+
     def core_text(self):
         """Return empty string for ast.Module nodes to avoid including text not selected
-        by the user. For ast.Call nodes, use jedi to search for a function defintion and
-        return source text of the function defintion. For all other nodes, return the
+        by the user. For ast.Call nodes, return the source text of the called definition,
+        located by `call_target` in this or another module. For all other nodes, return the
         source text of this node, indicated by ast_node.lineno and ast_node.end_lineno.
         """
 
@@ -258,13 +552,8 @@ class Node:
             return ""
 
         if isinstance(self.ast_node, ast.Call):
-            line, col = self.ast_node.lineno, self.ast_node.col_offset
-            try:
-                get_first_ref = self.source.jedi.infer(line, col)[0]
-            except IndexError:
-                return "Function definition not found. Check imports and consider a manual link."
-
-            if "super" in get_first_ref.full_name:
+            func = self.ast_node.func
+            if isinstance(func, ast.Attribute) and au.is_super_call(func.value):
                 return (
                     "Function call '"
                     + astor.to_source(self.ast_node)
@@ -272,12 +561,13 @@ class Node:
                     + self.inheritance
                 )
 
-            function_name = get_first_ref.full_name.split(".")[-1]
-
-            visitor = ExtractFunctionSource(function_name, self.source)
-            visitor.visit(ast.parse(self.source.text))
-            return visitor.function_def
+            target = self.call_target()
+            if target is None:
+                return "Function definition not found. Check imports and consider a manual link."
+            path, span = target
+            if path == self.source.path:
+                return self.source.segment(*span)
+            # only the span is needed, not a parsed Source for the whole file
+            return file_segment(path, *span)
 
-        return self.source.text.split("\n")[
-            self.ast_node.lineno - 1 : self.ast_node.end_lineno
-        ]
+        return self.source.lines[self.ast_node.lineno - 1 : self.ast_node.end_lineno]
@@ -0,0 +1,157 @@
+"""
+Speculative summarization while the interactive loop waits for input. The
+line is read in a daemon thread while the main thread summarizes the nodes
+the user is likely to summarize next. Resolving calls and reading the core
+text of the chosen nodes runs jedi, so it is done one node at a time in a
+worker thread, leaving the event loop free to take the line. When the line
+arrives, the prefetch is cancelled once the node in hand is done, so nodes,
+sources and caches are never used by two threads at once. Summaries that
+completed stay in the summary cache, and on attached nodes, so that a later
+`S` finds them instead of waiting for the model.
+"""
+
+import ast
+import asyncio
+import contextvars
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from astound import astound_config, max_concurrency
+from astound.ast_node_utils import DEFINITION_TYPES
+from astound.instrument import metrics
+from astound.llm import asyncio_run
+from astound.node import Node
+from astound.refresh import walk
+from astound.scheduler import BACKGROUND, priority
+from astound.summarize import individual_summary_async, summarize_async
+
+_WORKER = None
+
+
+def prefetch_enabled():
+    return astound_config["prefetch"]["enabled"]
+
+
+async def off_loop(function, *args):
+    """
+    Run function in the prefetch worker thread, with the context of the
+    caller. If the caller is cancelled, the call is still waited for, so that
+    the caller's nodes are free again when the cancellation arrives.
+    """
+    global _WORKER
+    if _WORKER is None:
+        _WORKER = ThreadPoolExecutor(1, thread_name_prefix="astound-prefetch")
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    future = loop.run_in_executor(_WORKER, context.run, function, *args)
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        await asyncio.wait([future])
+        raise
+
+
+async def likely_subnodes(node: Node, limit: int):
+    """up to limit unattached components of node that are worth summarizing
+    ahead of time: definitions, and calls whose target can be resolved"""
+    if node.ast_node is None or node.source is None or limit <= 0:
+        return
+    for subnode, _ in await off_loop(node.split):
+        ast_node = subnode.ast_node
+        if not hasattr(ast_node, "lineno"):
+            continue
+        if f"{ast_node.lineno},{ast_node.col_offset}" in node.children:
+            continue
+        if isinstance(ast_node, DEFINITION_TYPES) or (
+            isinstance(ast_node, ast.Call)
+            and await off_loop(subnode.call_target) is not None
+        ):
+            # a fresh node, so that the cached components are not modified
+            yield Node(ast_node, source=node.source)
+            limit -= 1
+            if limit == 0:
+                return
+
+
+async def prefetch(node: Node, max_nodes: int, max_unattached: int):
+    """
+    Summarize the attached children of node, then its likely unattached
+    subnodes, until max_nodes nodes have been taken on. The core text of node
+    itself is summarized too, leaving only the final joint request to `S`; its
+    summary is not recorded, as the user may still attach more children.
+    Core texts are read off the loop first, which leaves the jedi inferences
+    of calls in the inference cache when the summaries read them again.
+
+    Returns:
+        int: The number of nodes summarized.
+    """
+    chosen, budget = [], max_nodes
+    for child in node.children.values():
+        size = sum(1 for x in walk(child) if not x.summary)
+        if 0 < size <= budget:
+            chosen.append(child)
+            budget -= size
+
+    with priority(BACKGROUND):
+        async for subnode in likely_subnodes(node, min(max_unattached, budget)):
+            chosen.append(subnode)
+
+        pending = [x for child in chosen for x in walk(child) if not x.summary]
+        for x in [node, *pending]:
+            await off_loop(x.core_text)
+
+        semaphore = asyncio.Semaphore(max_concurrency)
+        await asyncio.gather(
+            individual_summary_async(node, semaphore),
+            *[summarize_async(x, semaphore=semaphore) for x in chosen],
+        )
+    metrics.count("prefetch.nodes", len(chosen))
+    return len(chosen)
+
+
+async def _input_with_prefetch(node: Node, prompt: str):
+    loop = asyncio.get_running_loop()
+    line = loop.create_future()
+
+    def settle(result, exc):
+        if line.done():
+            return
+        if exc is not None:
+            line.set_exception(exc)
+        else:
+            line.set_result(result)
+
+    def read():
+        try:
+            result, exc = input(prompt), None
+        except EOFError as error:
+            result, exc = None, error
+        try:
+            loop.call_soon_threadsafe(settle, result, exc)
+        except RuntimeError:  # the loop is gone, e.g. on interrupt
+            pass
+
+    # a daemon thread does not hold up exit while it waits for the terminal
+    threading.Thread(target=read, daemon=True).start()
+    config = astound_config["prefetch"]
+    task = asyncio.ensure_future(
+        prefetch(node, config["max_nodes"], config["max_unattached"])
+    )
+    try:
+        return await line
+    finally:
+        if not task.done():
+            metrics.count("prefetch.cancelled")
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        except Exception as exc:  # prefetching must never break the loop
+            logging.info("prefetch failed: %s", exc)
+
+
+def input_with_prefetch(node: Node, prompt: str):
+    """input(prompt), summarizing likely next nodes below node meanwhile"""
+    return asyncio_run(_input_with_prefetch(node, prompt))
@@ -0,0 +1,198 @@
+import hashlib
+import logging
+import os
+from difflib import SequenceMatcher
+
+from astound.registry import source_registry
+from astound.summarize import summarize_concurrent
+
+
+def walk(node):
+    """node and all nodes attached below it, parents first"""
+    yield node
+    for child in node.children.values():
+        yield from walk(child)
+
+
+def changed_sources(root):
+    """Sources under root whose file has been modified since it was read"""
+    changed = {}
+    for node in walk(root):
+        source = node.source
+        if source is None or id(source) in changed:
+            continue
+        try:
+            mtime = os.path.getmtime(source.path)
+        except OSError:
+            logging.warning("source %s can no longer be read", source.path)
+            continue
+        if mtime != source.mtime:
+            changed[id(source)] = source
+    return list(changed.values())
+
+
+def line_map(old_lines, new_lines):
+    """old line number -> new line number (1-based) for lines that are unchanged,
+    or edited in place within a block of the same length"""
+    mapping = {}
+    matcher = SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal" or (tag == "replace" and i2 - i1 == j2 - j1):
+            mapping.update((i + 1, j + 1) for i, j in zip(range(i1, i2), range(j1, j2)))
+    return mapping
+
+
+def line_digests(lines):
+    """short hashes of lines, which `line_map` can compare in place of the lines
+    themselves"""
+    return [hashlib.blake2b(line.encode(), digest_size=4).hexdigest() for line in lines]
+
+
+def definition_name(source, lineno, col_offset):
+    """qualified name of the definition starting at (lineno, col_offset), or None"""
+    for name, span in source.definitions.items():
+        if span[:2] == (lineno, col_offset):
+            return name
+    return None
+
+
+class Remapper:
+    """finds the position in the new version of a source of a node attached to
+    the old version"""
+
+    def __init__(self, old, new):
+        self.old = old
+        self.new = new
+        self.lines = line_map(old.lines, new.lines)
+
+    @classmethod
+    def from_digests(cls, digests, new):
+        """Remapper from the `line_digests` of the old version instead of the old
+        Source, e.g. one saved in a session; only `locate` can be used"""
+        remapper = cls.__new__(cls)
+        remapper.old = None
+        remapper.new = new
+        remapper.lines = line_map(digests, line_digests(new.lines))
+        return remapper
+
+    def find(self, lineno, col_offset, type_code, parent_position):
+        index = self.new.index
+        for i in index.at(lineno, col_offset):
+            if index.type_code[i] == type_code and (
+                parent_position is None or index.is_descendant(parent_position, i)
+            ):
+                return i
+        return None
+
+    def position(self, ast_position, parent_position=None):
+        """new preorder position of the old node at ast_position, or None if it
+        no longer exists"""
+        if ast_position == 0:
+            return 0
+        old_index = self.old.index
+        lineno = old_index.lineno[ast_position]
+        col_offset = old_index.col_offset[ast_position]
+        return self.locate(
+            lineno,
+            col_offset,
+            old_index.type_code[ast_position],
+            definition_name(self.old, lineno, col_offset),
+            parent_position,
+        )
+
+    def locate(self, lineno, col_offset, type_code, name, parent_position=None):
+        """new preorder position of the node of type_code that started at
+        (lineno, col_offset) in the old version, or None if it no longer exists.
+        name is the qualified name of the node if it is a definition."""
+        if lineno in self.lines:
+            found = self.find(
+                self.lines[lineno], col_offset, type_code, parent_position
+            )
+            if found is not None:
+                return found
+
+        # a definition whose first line was edited can still be found by name
+        if name in self.new.definitions:
+            new_lineno, new_col_offset, _, _ = self.new.definitions[name]
+            return self.find(new_lineno, new_col_offset, type_code, parent_position)
+        return None
+
+
+def remap(node, remappers, parent_position=None):
+    """move node and its attached descendants onto the new versions of their
+    sources. Children that cannot be found any more are detached."""
+    old_source = node.source
+    remapper = remappers.get(id(old_source))
+    if remapper is not None and node.ast_position is not None:
+        node.source = remapper.new
+        node.ast_position = remapper.position(node.ast_position, parent_position)
+        node.split_cache = {}
+        node.split_generation = None
+
+    children = {}
+    for key, child in node.children.items():
+        same_source = child.source is old_source and child.ast_position is not None
+        old_key = _position_key(child) if same_source else None
+        remap(child, remappers, node.ast_position if same_source else None)
+        if child.ast_position is None and child.detached_ast_node is None:
+            logging.warning("attached node %s was removed from its source", key)
+            continue
+        # ast subnodes are keyed by their position; manual links keep their name
+        if key == old_key:
+            key = _position_key(child)
+        children[key] = child
+    node.children = children
+    node.render_cache = {}
+
+
+def _position_key(node):
+    index = node.source.index
+    return f"{index.lineno[node.ast_position]},{index.col_offset[node.ast_position]}"
+
+
+def invalidate(node, stale):
+    """clear, children first, the summaries whose core text or child summaries
+    have changed, collecting the nodes cleared in stale"""
+    for child in node.children.values():
+        invalidate(child, stale)
+    if node.summary and node.summary_inputs_changed():
+        node.summary = ""
+        stale.append(node)
+
+
+def refresh(root):
+    """
+    Re-read the sources under root that have changed on disk, move the attached
+    nodes to their new positions and re-summarize only the nodes whose span,
+    descendants or, for calls, called definition changed. Summaries of everything else are kept.
+
+    Returns:
+        list: The topmost nodes that were re-summarized.
+    """
+    remappers = {}
+    for old in changed_sources(root):
+        source_registry.discard(old)
+        remappers[id(old)] = Remapper(old, source_registry.get(old.path))
+    if remappers:
+        remap(root, remappers)
+
+    # a call is stale when the file of its callee changed, even if none of the
+    # sources in the tree did
+    stale = []
+    invalidate(root, stale)
+
+    stale_ids = {id(node) for node in stale}
+    topmost = [
+        node
+        for node in stale
+        if not any(id(ancestor) in stale_ids for ancestor in ancestors(node))
+    ]
+    for node in topmost:
+        summarize_concurrent(node)
+    return topmost
+
+
+def ancestors(node):
+    while node.parent is not None:
+        node = node.parent
+        yield node
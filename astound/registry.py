@@ -0,0 +1,65 @@
+import logging
+import os
+from collections import OrderedDict
+
+from astound import astound_config
+from astound.node import Source
+from astound.smartparse import discover_types
+
+
+class SourceRegistry:
+    """
+    Session-wide table of open Sources. A file is read and parsed once per
+    (resolved path, mtime), however many nodes it is attached under. Sources are
+    kept in order of last focus; when the estimated size of their parsed state
+    exceeds `max_loaded_bytes`, the least recently focused ones are unloaded.
+    Unloaded sources rebuild their state transparently the next time it is used.
+    """
+
+    def __init__(self, max_loaded_bytes: int):
+        self.max_loaded_bytes = max_loaded_bytes
+        self.sources = OrderedDict()  # (real path, mtime) -> Source
+
+    def get(self, path: str):
+        """return the Source for path, creating it on first use, and focus it.
+        The node types of a new source are discovered here, before anything
+        below it is summarized. Sources read at an earlier mtime of the same
+        file are forgotten."""
+        key = (os.path.realpath(path), os.path.getmtime(path))
+        source = self.sources.get(key)
+        if source is None:
+            for stale in [k for k in self.sources if k[0] == key[0]]:
+                del self.sources[stale]
+            source = Source(path)
+            discover_types(source.index)
+            self.sources[key] = source
+        self.focus(source)
+        return source
+
+    def focus(self, source: Source):
+        """mark source as most recently used and enforce the memory budget"""
+        key = (os.path.realpath(source.path), source.mtime)
+        if key in self.sources:
+            self.sources.move_to_end(key)
+        self.evict()
+
+    def discard(self, source: Source):
+        """forget source, e.g. because its file has changed since it was read"""
+        self.sources.pop((os.path.realpath(source.path), source.mtime), None)
+
+    def loaded_bytes(self):
+        return sum(source.heavy_size() for source in self.sources.values())
+
+    def evict(self):
+        total = self.loaded_bytes()
+        # the most recently focused source is never evicted
+        for source in list(self.sources.values())[:-1]:
+            if total <= self.max_loaded_bytes:
+                break
+            if source.loaded():
+                total -= source.heavy_size()
+                source.unload()
+                logging.info("unloaded source %s", source.path)
+
+
+source_registry = SourceRegistry(**astound_config["sources"])
@@ -1,7 +1,10 @@
 import logging
 
+from astound import session
 from astound.cursor import Cursor, display_tree
-from astound.node import Source
+from astound.instrument import metrics
+from astound.prefetch import input_with_prefetch, prefetch_enabled
+from astound.registry import source_registry
 
 logging.basicConfig(level=logging.ERROR)
 
@@ -12,13 +15,13 @@ class InvalidInput(Exception):
     pass
 
 
-WELCOME_STR = "\nWelcome to Astound! Please enter your source path to begin:\n\n"
+WELCOME_STR = "\nWelcome to Astound! Please enter your source path or .astound session to begin:\n\n"
 POST_WELCOME_STR = (
     "\nThanks! I have created a parent node based on your file and moved the cursor to this node.\n"
     "Now you can attach children, either from the AST of this file or from other files.\n\n"
     "The menu is printed below. I recommend starting with 'C' so that you can see the AST subnodes of this node.\n\n"
 )
-SHORT_MENU_STR = "\n\n[ A: Attach, U: Up, D: Down, C: Cursor, P: Print, S: summarize, M: menu, Q: quit ]\n\n"
+SHORT_MENU_STR = "\n\n[ A: Attach, U: Up, D: Down, F: Follow, C: Cursor, P: Print, S: summarize, R: refresh, W: write, L: load, I: instrumentation, M: menu, Q: quit ]\n\n"
 LONG_MENU_STR = (
     "Here is the menu: \n"
     " - Type 'A line,col' to link an ast subnode at (line,col) and navigate down to it\n"
@@ -26,11 +29,18 @@ LONG_MENU_STR = (
     "             filename source.path and navigate down to it\n"
     " - Type 'U' to navigate up to the parent node\n"
     " - Type 'D key' to navigate down to a child named 'key'\n"
+    " - Type 'F' to link the definition called by the current node and navigate down to it\n"
+    "        'F line,col' to do the same for the call subnode at (line,col)\n"
     " - Type 'C' to print the cursor state.\n"
     " - Type 'P node' to print the current node source text\n"
     "        'P a,b' to print the source text from lines a to b\n"
     "        'P tree' to print a tree overview from root\n"
     " - Type 'S' to summarize down from the current node inclusive\n"
+    " - Type 'R' to re-read edited source files and re-summarize what changed\n"
+    " - Type 'W file.astound' to save the tree, its summaries and the cursor position\n"
+    " - Type 'L file.astound' to load a saved tree\n"
+    " - Type 'I' to print timing and token usage for this session\n"
+    "        'I file.json' to also write them to file.json\n"
     " - Type 'M' for the full menu description.\n"
     " - Type 'Q' to quit\n"
 )
@@ -72,6 +82,20 @@ def up_command(cursor, post):
     return True
 
 
+def follow_command(cursor, post):
+    """wraps cursor.follow()"""
+    keystr = post.split(",")
+    try:
+        if len(keystr) == 2:
+            cursor.follow(line=int(keystr[0]), col=int(keystr[1]))
+        else:
+            cursor.follow()
+    except ValueError as exc:
+        raise InvalidInput(f"cannot follow: {exc}") from exc
+    print(cursor)
+    return True
+
+
 def cursor_command(cursor, post):
     """wraps cursor.__repr__()"""
     print(cursor)
@@ -106,6 +130,53 @@ def summarize_command(cursor, post):
     return True
 
 
+def refresh_command(cursor, post):
+    """wraps cursor.refresh()"""
+    refreshed = cursor.refresh()
+    if not refreshed:
+        print("No summaries needed updating.")
+    for node in refreshed:
+        print(f"{node.name()}:\n{node.summary}\n")
+    return True
+
+
+def write_command(cursor, post):
+    """wraps session.save"""
+    try:
+        session.save(cursor, post)
+    except (OSError, ValueError) as exc:
+        raise InvalidInput(f"could not save session: {exc}") from exc
+    print(f"session written to {post}")
+    return True
+
+
+def load_command(cursor, post):
+    """wraps session.load and moves this cursor to the loaded tree"""
+    try:
+        loaded = session.load(post)
+    except (OSError, ValueError) as exc:
+        raise InvalidInput(f"could not load session: {exc}") from exc
+    cursor.root, cursor.current, cursor.depth = (
+        loaded.root,
+        loaded.current,
+        loaded.depth,
+    )
+    print(cursor)
+    return True
+
+
+def instrumentation_command(cursor, post):
+    """print the session metrics and, if post names a file, dump them there as json"""
+    print(metrics.report())
+    if post:
+        try:
+            metrics.dump(post)
+        except OSError as exc:
+            raise InvalidInput("could not write metrics file") from exc
+        print(f"\nmetrics written to {post}")
+    return True
+
+
 def menu_command(cursor, post):
     """print long menu string"""
     print(LONG_MENU_STR)
@@ -135,9 +206,14 @@ def parse_input(cursor, instr: str):
         "A": attach_command,
         "U": up_command,
         "D": down_command,
+        "F": follow_command,
         "C": cursor_command,
         "P": print_command,
         "S": summarize_command,
+        "R": refresh_command,
+        "W": write_command,
+        "L": load_command,
+        "I": instrumentation_command,
         "M": menu_command,
         "Q": quit_command,
     }
@@ -151,15 +227,21 @@ def parse_input(cursor, instr: str):
 if __name__ == "__main__":
     print(WELCOME_STR)
     source_path = input("enter source path: ")
-    src = Source(clean_str(source_path))
-    cur = Cursor(root=src)
+    source_path = clean_str(source_path)
+    if source_path.endswith(session.SESSION_SUFFIX):
+        cur = session.load(source_path)
+    else:
+        cur = Cursor(root=source_registry.get(source_path))
 
     print(POST_WELCOME_STR)
     print(LONG_MENU_STR)
 
     state = True
     while True:
-        user_input = input(SHORT_MENU_STR)
+        if prefetch_enabled():
+            user_input = input_with_prefetch(cur.current, SHORT_MENU_STR)
+        else:
+            user_input = input(SHORT_MENU_STR)
         print("\n")
         try:
             state = parse_input(cur, user_input)
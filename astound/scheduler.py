@@ -0,0 +1,264 @@
+import asyncio
+import contextlib
+import contextvars
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+
+from astound import astound_config, max_concurrency
+from astound.instrument import metrics
+
+# priority classes, lower values are served first
+INTERACTIVE = 0
+BACKGROUND = 1
+
+_PRIORITY = contextvars.ContextVar("astound_llm_priority", default=INTERACTIVE)
+
+
+@contextlib.contextmanager
+def priority(level: int):
+    """run the language model requests made in this block at priority level,
+    including those of asyncio tasks started from it"""
+    token = _PRIORITY.set(level)
+    try:
+        yield
+    finally:
+        _PRIORITY.reset(token)
+
+
+class TransientError(Exception):
+    """a request failed in a way that is worth retrying, e.g. a dropped
+    connection or a server error; retry_after is the delay the API asked for"""
+
+    def __init__(self, message: str, retry_after: float = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ThrottledError(TransientError):
+    """a request was rejected because of rate limits or lack of capacity"""
+
+
+class TokenBucket:
+    """
+    Refills at rate tokens per second up to capacity. `reserve` takes tokens at
+    once, going into debt if there are not enough, and returns how long the
+    caller has to wait until they would have been available. Debt makes large
+    requests wait in proportion to their size instead of starving.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self, n: float = 1.0):
+        with self.lock:
+            now = time.monotonic()
+            elapsed = now - self.updated
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated = now
+            self.tokens -= n
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+def _bucket(per_minute: float):
+    if not per_minute:
+        return None
+    rate = per_minute / 60
+    return TokenBucket(rate, max(1.0, rate))
+
+
+class Scheduler:
+    """
+    Admission control shared by every language model request of the process,
+    whichever thread or event loop it comes from. A request first takes one
+    of `limit` slots, waiting in order of priority and then of arrival, then
+    waits for the request and input token rate limits, and keeps its slot
+    while it is sent.
+
+    The limit adapts to the API (additive increase, multiplicative decrease).
+    It is halved when a request is throttled, at most once per `base_delay`
+    seconds, and it grows back by about one slot per `limit` successful
+    requests, up to `max_concurrency`. Failed requests are retried by the
+    caller after `backoff`, with exponential backoff and full jitter.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = max_concurrency,
+        requests_per_minute: float = 0,
+        input_tokens_per_minute: float = 0,
+        max_retries: int = 6,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        seed: int = None,
+    ):
+        self.max_concurrency = max_concurrency
+        self.limit = float(max_concurrency)
+        self.requests = _bucket(requests_per_minute)
+        self.input_tokens = _bucket(input_tokens_per_minute)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.active = 0
+        self.waiters = []  # heap of (priority, arrival, grant callback)
+        self.arrivals = itertools.count()
+        self.decreased = float("-inf")
+
+    def _enter(self, grant):
+        """take a slot now and return True, or queue grant to be called when one
+        is handed over"""
+        with self.lock:
+            if not self.waiters and self.active < int(self.limit):
+                self.active += 1
+                return True
+            heapq.heappush(self.waiters, (_PRIORITY.get(), next(self.arrivals), grant))
+            metrics.count("scheduler.queued")
+            return False
+
+    def _dispatch(self):
+        """hand free slots to the waiters first in line"""
+        grants = []
+        with self.lock:
+            while self.waiters and self.active < int(self.limit):
+                self.active += 1
+                grants.append(heapq.heappop(self.waiters)[2])
+        for grant in grants:
+            grant()
+
+    def release(self):
+        with self.lock:
+            self.active -= 1
+        self._dispatch()
+
+    def delay(self, input_tokens: int):
+        """seconds to wait for the rate limits, reserving the request"""
+        delays = [0.0]
+        if self.requests is not None:
+            delays.append(self.requests.reserve())
+        if self.input_tokens is not None:
+            delays.append(self.input_tokens.reserve(input_tokens))
+        return max(delays)
+
+    def record(self, exc):
+        """adapt the limit to the outcome of a request: exc is None on success"""
+        with self.lock:
+            if exc is None:
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            elif isinstance(exc, ThrottledError):
+                metrics.count("scheduler.throttled")
+                now = time.monotonic()
+                # throttling reported by requests already in flight is one event
+                if now - self.decreased >= self.base_delay:
+                    self.decreased = now
+                    self.limit = max(1.0, self.limit / 2)
+                    logging.info("llm concurrency reduced to %d", self.limit)
+        if exc is None:
+            self._dispatch()
+
+    @contextlib.contextmanager
+    def slot(self, input_tokens: int = 0):
+        """hold a slot, blocking the calling thread until one is granted. Must not
+        be used from a thread running an event loop, where waiting would stall
+        the tasks that hold the slots; use `slot_async` there."""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            raise RuntimeError(
+                "blocking llm request on a running event loop; "
+                "use the async backend methods or run it in an executor"
+            )
+        granted = threading.Event()
+        if not self._enter(granted.set):
+            with metrics.timed("scheduler.wait"):
+                granted.wait()
+        try:
+            time.sleep(self.delay(input_tokens))
+            yield
+        except Exception as exc:
+            self.record(exc)
+            raise
+        else:
+            self.record(None)
+        finally:
+            self.release()
+
+    @contextlib.asynccontextmanager
+    async def slot_async(self, input_tokens: int = 0):
+        """hold a slot, suspending the calling task until one is granted"""
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+
+        def resolve():
+            # a waiter cancelled in the queue passes its slot on
+            if granted.cancelled():
+                self.release()
+            else:
+                granted.set_result(None)
+
+        def grant():
+            try:
+                loop.call_soon_threadsafe(resolve)
+            except RuntimeError:  # the loop of the waiter has been closed
+                self.release()
+
+        if not self._enter(grant):
+            with metrics.timed("scheduler.wait"):
+                try:
+                    await granted
+                except asyncio.CancelledError:
+                    # cancelled after the slot was handed over but before
+                    # resuming; otherwise `resolve` passes it on
+                    if granted.done() and not granted.cancelled():
+                        self.release()
+                    raise
+        try:
+            await asyncio.sleep(self.delay(input_tokens))
+            yield
+        except Exception as exc:
+            self.record(exc)
+            raise
+        else:
+            self.record(None)
+        finally:
+            self.release()
+
+    def backoff(self, exc: Exception, attempt: int):
+        """seconds to wait before retrying after the attempt-th failure (counting
+        from 0), or None if exc is not transient or the retries are used up"""
+        if not isinstance(exc, TransientError) or attempt >= self.max_retries:
+            return None
+        metrics.count("scheduler.retry")
+        delay = self.random.uniform(
+            0, min(self.max_delay, self.base_delay * 2**attempt)
+        )
+        if exc.retry_after is not None:
+            delay = max(delay, exc.retry_after)
+        logging.info("retrying llm request in %.1f s after %s", delay, exc)
+        return delay
+
+
+_SCHEDULER = None
+
+
+def get_scheduler() -> Scheduler:
+    """the scheduler of this process, configured under `llm.scheduler`"""
+    global _SCHEDULER
+    if _SCHEDULER is None:
+        _SCHEDULER = Scheduler(**astound_config["llm"]["scheduler"])
+    return _SCHEDULER
+
+
+def set_scheduler(scheduler: Scheduler):
+    global _SCHEDULER
+    _SCHEDULER = scheduler
@@ -0,0 +1,291 @@
+import ast
+import gzip
+import hashlib
+import json
+import logging
+import os
+from collections.abc import MutableMapping
+
+from astound.ast_index import TYPE_CODES
+from astound.cursor import Cursor
+from astound.inference import project_path
+from astound.node import Node
+from astound.refresh import Remapper, line_digests
+from astound.registry import source_registry
+
+SESSION_VERSION = 2
+SESSION_SUFFIX = ".astound"
+
+# a saved node is a list of these fields, in this order
+NODE_FIELDS = (
+    "source",  # index into the session's source table
+    "ast_position",
+    "lineno",
+    "col_offset",
+    "type",
+    "definition",  # qualified name of a def or class statement, else None
+    "summary",
+    "span_hash",
+    "children_hash",
+    "children",  # key -> saved node
+)
+
+
+def text_hash(text: str):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class SessionLoader:
+    """Rebuilds the Sources and Nodes of a saved session on demand. A source is
+    read when the first node that refers to it is visited; if its content no
+    longer matches the saved hash, its nodes are moved to their new positions
+    as `refresh` would, by diffing the saved line digests against the current
+    lines, and their summaries are dropped. Nodes of sources that can no longer
+    be read are dropped."""
+
+    def __init__(self, sources, root: str):
+        # [path relative to root, content hash, line digests] per source id
+        self.sources = sources
+        self.root = root
+        self.resolved = {}  # source id -> (Source, Remapper or None), or None
+
+    def source(self, source_id: int):
+        if source_id not in self.resolved:
+            path, saved_hash, digests = self.sources[source_id]
+            path = os.path.join(self.root, path)
+            try:
+                source = source_registry.get(path)
+            except (OSError, SyntaxError, ValueError) as exc:
+                logging.warning("cannot read %s, its nodes are dropped: %s", path, exc)
+                self.resolved[source_id] = None
+                return None
+            remapper = None
+            if text_hash(source.text) != saved_hash:
+                logging.warning(
+                    "%s changed since the session was saved; its summaries are dropped",
+                    path,
+                )
+                remapper = Remapper.from_digests(digests, source)
+            self.resolved[source_id] = (source, remapper)
+        return self.resolved[source_id]
+
+    def node(self, record, parent=None):
+        """Node for a saved record, or None if it cannot be found in its source"""
+        saved = dict(zip(NODE_FIELDS, record))
+        resolved = self.source(saved["source"])
+        if resolved is None:
+            return None
+        source, remapper = resolved
+        position = saved["ast_position"]
+        if remapper is not None and position != 0:
+            ast_type = getattr(ast, saved["type"], None)
+            if ast_type not in TYPE_CODES:
+                return None
+            same_source = parent is not None and parent.source is source
+            position = remapper.locate(
+                saved["lineno"],
+                saved["col_offset"],
+                TYPE_CODES[ast_type],
+                saved["definition"],
+                parent.ast_position if same_source else None,
+            )
+            if position is None:
+                return None
+
+        node = Node.at_position(source, position, parent=parent)
+        if remapper is None:
+            node.summary = saved["summary"]
+            node.span_hash = saved["span_hash"]
+            node.children_hash = saved["children_hash"]
+        node.children = LazyChildren(self, node, saved["children"])
+        return node
+
+
+class LazyChildren(MutableMapping):
+    """Children of a loaded node. Saved children become Nodes only when they
+    are looked up, so opening a session costs nothing per node; children that
+    can no longer be found in their source are dropped at that point."""
+
+    def __init__(self, loader: SessionLoader, parent: Node, records: dict):
+        self.loader = loader
+        self.parent = parent
+        self.entries = dict(records)  # key -> Node, or saved record until visited
+
+    def saved(self, key):
+        """the saved record of an unvisited child, or None if it was visited"""
+        entry = self.entries[key]
+        return None if isinstance(entry, Node) else entry
+
+    def __getitem__(self, key):
+        entry = self.entries[key]
+        if not isinstance(entry, Node):
+            entry = self.loader.node(entry, parent=self.parent)
+            if entry is None:
+                logging.warning("saved node %s was removed from its source", key)
+                del self.entries[key]
+                raise KeyError(key)
+            self.entries[key] = entry
+        return entry
+
+    def __setitem__(self, key, node):
+        self.entries[key] = node
+
+    def __delitem__(self, key):
+        del self.entries[key]
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def items(self):
+        # children dropped while being visited are skipped rather than raising
+        found = []
+        for key in list(self.entries):
+            try:
+                found.append((key, self[key]))
+            except KeyError:
+                pass
+        return found
+
+    def values(self):
+        return [node for _, node in self.items()]
+
+
+class SessionWriter:
+    """serializes a node tree, assigning source ids as sources are met. Paths
+    are saved relative to root, so that a session can be shared between
+    checkouts of a project."""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.sources = []
+        self.source_ids = {}  # (path, content hash) -> source id
+        self.written = {}  # id(Source) -> source id
+        self.definitions = {}  # source id -> {(lineno, col_offset): name}
+
+    def add_source(self, path: str, content_hash: str, digests):
+        key = (path, content_hash)
+        if key not in self.source_ids:
+            self.source_ids[key] = len(self.sources)
+            self.sources.append([path, content_hash, digests])
+        return self.source_ids[key]
+
+    def source_id(self, source):
+        if id(source) not in self.written:
+            path = os.path.relpath(os.path.realpath(source.path), self.root)
+            source_id = self.add_source(
+                path, text_hash(source.text), line_digests(source.lines)
+            )
+            names = {}
+            for name, span in source.definitions.items():
+                names.setdefault(span[:2], name)
+            self.definitions[source_id] = names
+            self.written[id(source)] = source_id
+        return self.written[id(source)]
+
+    def node(self, node: Node):
+        if node.source is None or node.ast_position is None:
+            return None
+        index = node.source.index
+        i = node.ast_position
+        source_id = self.source_id(node.source)
+        position = (index.lineno[i], index.col_offset[i])
+        record = [
+            source_id,
+            i,
+            *position,
+            type(index.nodes[i]).__name__,
+            self.definitions[source_id].get(position),
+            node.summary,
+            node.span_hash,
+            node.children_hash,
+            self.children(node.children),
+        ]
+        return record
+
+    def children(self, children):
+        out = {}
+        for key in children:
+            # unvisited children of a loaded session are copied without being built
+            saved = children.saved(key) if isinstance(children, LazyChildren) else None
+            if saved is not None:
+                out[key] = self.resaved(children.loader, saved)
+                continue
+            record = self.node(children[key])
+            if record is None:
+                logging.warning("node %s has no source position and is not saved", key)
+                continue
+            out[key] = record
+        return out
+
+    def resaved(self, loader: SessionLoader, record):
+        """copy a record from a loaded session, renumbering its sources"""
+        record = list(record)
+        path, content_hash, digests = loader.sources[record[0]]
+        path = os.path.relpath(os.path.join(loader.root, path), self.root)
+        record[0] = self.add_source(path, content_hash, digests)
+        record[-1] = {
+            key: self.resaved(loader, child) for key, child in record[-1].items()
+        }
+        return record
+
+
+def current_path(cursor: Cursor):
+    """keys leading from the root to the current node"""
+    path = []
+    node = cursor.current
+    while node is not cursor.root and node.parent is not None:
+        key = next(key for key, entry in node.parent.children.items() if entry is node)
+        path.append(key)
+        node = node.parent
+    return path[::-1]
+
+
+def save(cursor: Cursor, path: str):
+    """write the tree under cursor.root, its summaries and the cursor position to
+    a gzipped json file. Source paths are saved relative to the project, see
+    `project_path`."""
+    writer = SessionWriter(os.path.realpath(project_path()))
+    root = writer.node(cursor.root)
+    if root is None:
+        raise ValueError("the root node has no source and cannot be saved")
+    session = {
+        "version": SESSION_VERSION,
+        "sources": writer.sources,
+        "root": root,
+        "current": current_path(cursor),
+    }
+    with gzip.open(path, "wt", encoding="utf-8") as file:
+        json.dump(session, file, separators=(",", ":"))
+
+
+def load(path: str):
+    """
+    Open a session written by `save`, resolving its source paths against the
+    project of the working directory. Only the root and the nodes on the way to
+    the saved cursor position are built; everything else is built when visited.
+
+    Returns:
+        Cursor: A cursor at the saved position.
+    """
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        session = json.load(file)
+    if session.get("version") != SESSION_VERSION:
+        raise ValueError(f"unsupported session version {session.get('version')}")
+
+    loader = SessionLoader(session["sources"], os.path.realpath(project_path()))
+    root = loader.node(session["root"])
+    if root is None:
+        raise ValueError("the root source of the session cannot be read")
+    cursor = Cursor(root)
+    for key in session["current"]:
+        try:
+            cursor.down(key)
+        except KeyError:
+            break
+    return cursor
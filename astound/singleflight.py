@@ -0,0 +1,90 @@
+import asyncio
+import threading
+
+from astound.instrument import metrics
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls. The first caller for a key runs the
+    call; callers arriving with the same key while it is in flight wait for it
+    and share its result or exception instead of repeating it; the waiters of
+    an async call whose leader is cancelled make the call again. Keys are
+    forgotten as soon as the call finishes, so this never serves stale results;
+    persistent reuse is the job of the caches.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.lock = threading.Lock()
+        self.calls = {}  # key -> _Call, for blocking callers
+        self.futures = {}  # (event loop, key) -> asyncio.Future
+
+    def do(self, key, function):
+        """result of function(), shared with concurrent callers from other threads"""
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+        if not leader:
+            metrics.count(f"{self.name}.coalesced")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = function()
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+        return call.result
+
+    async def do_async(self, key, function):
+        """result of awaiting function(), shared with concurrent callers on the
+        same event loop"""
+        loop = asyncio.get_running_loop()
+        future = self.futures.get((loop, key))
+        while future is not None:
+            metrics.count(f"{self.name}.coalesced")
+            try:
+                # shielded so that a cancelled waiter does not cancel the call
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # the waiter itself was cancelled, unless the call was
+                if not future.cancelled():
+                    raise
+            # the leader was cancelled: make the call again, or wait for
+            # another waiter that already did
+            future = self.futures.get((loop, key))
+
+        future = self.futures[(loop, key)] = loop.create_future()
+        try:
+            result = await function()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            # marks the exception as retrieved when there were no waiters
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            del self.futures[(loop, key)]
+        return result
@@ -1,22 +1,89 @@
 import ast
-import json
+import asyncio
+import functools
 import logging
+import threading
 from types import MappingProxyType
 
-from astound import claude_model
+from astound import astound_config, claude_model, prompts
+from astound.ast_index import AST_TYPES
 from astound.ast_node_utils import pretty_type
+from astound.instrument import metrics
+from astound.llm import get_backend
+from astound.subfield_store import get_subfield_store
 
-with open("data/prompts.json", "r", encoding="UTF-8") as f:
-    PROMPTS = MappingProxyType(json.load(f))
 
-MESSAGE_KWARGS = MappingProxyType(
-    {
-        "model": claude_model,
-        "max_tokens": 50,
-        "temperature": 0.0,
-        "system": PROMPTS["field_system_prompt"],
-    }
-)
+@functools.lru_cache(maxsize=None)
+def message_kwargs():
+    return MappingProxyType(
+        {
+            "model": claude_model,
+            "max_tokens": 50,
+            "temperature": 0.0,
+            "system": prompts()["field_system_prompt"],
+        }
+    )
+
+
+def batch_message_kwargs(n_types: int):
+    """message keyword arguments for a request about n_types types at once"""
+    return {**message_kwargs(), "max_tokens": 50 + 30 * n_types}
+
+
+# process-level type -> field tuple table, see `subfield_table`
+_SUBFIELD_TABLE = {}
+# types whose entry has been refined by the language model
+_REFINED_TYPES = set()
+# serializes `discover_types` calls made from executor threads
+_DISCOVER_LOCK = threading.Lock()
+
+
+def _on_event_loop():
+    """whether an event loop is running in this thread, where a blocking
+    language model request would stall every task of the loop"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def static_fields(ast_type: type):
+    """
+    Fields of an ast type that may hold child nodes: all of its `_fields`,
+    which every Python version provides. Fields that turn out to hold
+    identifiers, constants or operators are skipped by `Node.iter_split`.
+    """
+    return tuple(ast_type._fields)
+
+
+def subfield_table():
+    """
+    Return the process-level table mapping ast types to the tuple of fields
+    that contain child nodes. On first use the table is seeded with
+    `static_fields` for every node class in `ast` and then overlaid with the
+    language model refinements in the subfield store, read in a single query.
+    """
+    if _SUBFIELD_TABLE:
+        return _SUBFIELD_TABLE
+
+    with metrics.timed("subfield_table.load"):
+        _load_subfield_table()
+    return _SUBFIELD_TABLE
+
+
+def _load_subfield_table():
+    for ast_type in vars(ast).values():
+        if isinstance(ast_type, type) and issubclass(ast_type, ast.AST):
+            _SUBFIELD_TABLE[ast_type] = static_fields(ast_type)
+
+    for key, fields in get_subfield_store().load().items():
+        ast_type = getattr(ast, key, None)
+        if ast_type is None:
+            logging.info("subfield_store has unknown type %s", key)
+            continue
+        _SUBFIELD_TABLE[ast_type] = fields
+        _REFINED_TYPES.add(ast_type)
 
 
 def type_header(t):
@@ -27,6 +94,17 @@ def type_header(t):
     )
 
 
+def types_header(type_names):
+    return (
+        "For each of the following python ast node types, which subfields contain "
+        "child nodes? Omit fields that contain only strings. Strongly consider "
+        "fields named 'value', 'func', or 'body'. Return only immediate subfields, "
+        "i.e. 'subfield' is ok but 'subfield.subsubfield' is not. Answer with one "
+        "line per type, in the form 'Type: field, field', and leave the list empty "
+        "for types without such fields.\n\n" + "\n".join(type_names)
+    )
+
+
 def validate_field(ast_node, field):
     if not hasattr(ast_node, field):
         logging.info(
@@ -62,61 +140,122 @@ def validate_field(ast_node, field):
     return False
 
 
-def parser_type_query(
-    ast_node: ast.AST,
-    anthropic_client: "anthropic.Anthropic",
-    sqlite_conn: "sqlite3.Connection",
-):
+def parser_type_query(ast_node: ast.AST):
     """
     Determines which attributes of an ast node of a given type contain
-    child nodes by querying a language model. Avoids duplicate queries by maintaining
-    a database of types already encountered.
+    child nodes. Answers come from the in-memory `subfield_table`, so a lookup
+    does no I/O. Types that are missing from the subfield store are refined by
+    querying a language model only if `smartparse.llm_refine` is set in the
+    config and no event loop is running in this thread; otherwise the static
+    `ast` metadata is used as is.
 
     Inputs:
         ast_node: ast node of the desired type. Note that while the query only depends
             on the type of t, passing the entire node allows the parser to validate
             its response.
-        anthropic_client: language model API client
-        sqlite_conn: database connection
 
     Returns:
-        response (str): text list of names of fields that are (1.) attributes of the type
+        response (tuple): names of fields that are (1.) attributes of the type
         ast_node and (2.) contain None, a single ast node, or a list of ast_nodes.
     """
-    try:
-        cursor = sqlite_conn.cursor()
-
-        t = pretty_type(type(ast_node))
-        cursor.execute("SELECT value FROM subfield_store WHERE key = ?", (t,))
-        result = cursor.fetchone()
-
-        if result:
-            logging.info("found in db:: %s:%s", t, result)
-            return result[0]
-
-        prompt = type_header(t)
-        pre_list = (
-            anthropic_client.messages.create(
-                **MESSAGE_KWARGS, messages=[{"role": "user", "content": prompt}]
-            )
-            .content[0]
-            .text
-        )
-        pre_list = pre_list.replace(" ", "").split(",")
+    table = subfield_table()
+    ast_type = type(ast_node)
+
+    if ast_type in _REFINED_TYPES:
+        metrics.count("parser_type_query.hit")
+        return table[ast_type]
+    if not astound_config["smartparse"]["llm_refine"] or _on_event_loop():
+        # left unrefined, so that a later query off the loop can still refine it
+        if ast_type not in table:
+            table[ast_type] = static_fields(ast_type)
+        metrics.count("parser_type_query.hit")
+        return table[ast_type]
 
-        # remove stray characters and invalid types from list
-        field_list = [field for field in pre_list if validate_field(ast_node, field)]
-        field_list = ",".join(field_list)
-        logging.info("generated:: %s:%s", t, field_list)
+    metrics.count("parser_type_query.miss")
+    table[ast_type] = refine_type_query(ast_node)
+    _REFINED_TYPES.add(ast_type)
+    return table[ast_type]
 
-        # insert into database
-        cursor.execute(
-            """INSERT INTO subfield_store (key, value) VALUES (?, ?)""",
-            (t, field_list),
+
+def discover_types(index):
+    """
+    Refine, in a single language model request, every ast type in a module that
+    the subfield store has no answer for, so that splitting the module does not
+    stop to query types one at a time. Each answer is validated against a node
+    of the module and all are committed in one transaction. Types missing from
+    the answer are left to `parser_type_query`. Does nothing unless
+    `smartparse.llm_refine` is set.
+
+    The request blocks, so this must be called before summarizing starts, or
+    from an executor thread (see `discover_types_async`), never on a running
+    event loop.
+
+    Inputs:
+        index (AstIndex): index of the parsed module.
+    """
+    if not astound_config["smartparse"]["llm_refine"]:
+        return
+    if _on_event_loop():
+        logging.warning("not discovering node types on a running event loop")
+        return
+    with _DISCOVER_LOCK:
+        _discover_types(index)
+
+
+async def discover_types_async(index):
+    """`discover_types` in the default executor, for callers on an event loop"""
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, discover_types, index)
+
+
+def _discover_types(index):
+    subfield_table()
+    examples = {}  # type name -> first node of that type, for validation
+    for code in set(index.type_code):
+        ast_type = AST_TYPES[code]
+        if ast_type not in _REFINED_TYPES:
+            examples[pretty_type(ast_type)] = index.nodes[index.type_code.index(code)]
+    if not examples:
+        return
+
+    metrics.count("parser_type_query.batched", len(examples))
+    with metrics.timed("smartparse.discover"):
+        answer = get_backend().complete(
+            types_header(sorted(examples)),
+            label="fields",
+            **batch_message_kwargs(len(examples)),
+        )
+    answers = {}
+    for line in answer.split("\n"):
+        name, colon, pre_list = line.partition(":")
+        ast_node = examples.get(name.strip(" -*`'\""))
+        if not colon or ast_node is None:
+            continue
+        answers[pretty_type(type(ast_node))] = tuple(
+            field
+            for field in pre_list.replace(" ", "").split(",")
+            if field and validate_field(ast_node, field)
         )
-        logging.info("Generated list for type %s:\n%s", t, field_list)
+    logging.info("Generated lists for %s types:\n%s", len(answers), answers)
+
+    get_subfield_store().put_many(answers)
+    for name, field_list in answers.items():
+        ast_type = type(examples[name])
+        _SUBFIELD_TABLE[ast_type] = field_list
+        _REFINED_TYPES.add(ast_type)
+
+
+def refine_type_query(ast_node: ast.AST):
+    """query a language model for the child-bearing fields of the type of ast_node
+    and record the validated answer in the subfield store"""
+    t = pretty_type(type(ast_node))
+    prompt = type_header(t)
+    pre_list = get_backend().complete(prompt, label="fields", **message_kwargs())
+    pre_list = pre_list.replace(" ", "").split(",")
 
-        return field_list
+    # remove stray characters and invalid types from list
+    field_list = [field for field in pre_list if validate_field(ast_node, field)]
+    logging.info("Generated list for type %s:\n%s", t, field_list)
 
-    finally:
-        cursor.close()
+    get_subfield_store().put(t, field_list)
+    return tuple(field_list)
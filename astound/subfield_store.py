@@ -0,0 +1,163 @@
+import atexit
+import logging
+import os
+import platform
+import sqlite3
+import threading
+import time
+
+from astound import astound_config, cache_path
+from astound.instrument import metrics
+
+# migration i brings a database from user_version i to i + 1
+MIGRATIONS = (
+    """CREATE TABLE IF NOT EXISTS subfield_store (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    )""",
+    # ast fields differ between Python versions, so answers record the one they
+    # were validated against; rows from before this migration have NULL
+    """ALTER TABLE subfield_store ADD COLUMN python_version TEXT;
+    ALTER TABLE subfield_store ADD COLUMN updated REAL""",
+)
+SCHEMA_VERSION = len(MIGRATIONS)
+
+UPSERT = """INSERT INTO subfield_store (key, value, python_version, updated)
+VALUES (?, ?, ?, ?)
+ON CONFLICT (key) DO UPDATE SET
+    value = excluded.value,
+    python_version = excluded.python_version,
+    updated = excluded.updated"""
+
+
+def python_version():
+    return ".".join(platform.python_version_tuple()[:2])
+
+
+class SubfieldStore:
+    """
+    SQLite store of the child-bearing fields of each ast type, as refined by the
+    language model. Each thread of each process gets its own connection, so the
+    store can be shared by thread and process pools. The database runs in WAL
+    mode so that readers do not block the writer, the schema is created and
+    migrated under an exclusive lock on first connection, and writes are queued
+    and committed in batches of `batch_size` (and at exit) with an upsert, so
+    workers answering the same type concurrently cannot conflict.
+    """
+
+    def __init__(self, path: str, batch_size: int = 16, timeout: float = 30.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.pending = {}  # key -> comma separated fields, not yet committed
+
+    def connection(self):
+        """the connection of the calling thread, opened on first use; a forked
+        process opens its own rather than sharing its parent's"""
+        local = self.local
+        if getattr(local, "pid", None) != os.getpid():
+            # transactions are managed explicitly, see `migrate` and `flush`
+            local.conn = sqlite3.connect(
+                self.path, timeout=self.timeout, isolation_level=None
+            )
+            local.conn.execute("PRAGMA journal_mode = WAL")
+            local.pid = os.getpid()
+            self.migrate(local.conn)
+        return local.conn
+
+    def migrate(self, conn):
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # another process may have migrated while this one waited for the lock
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            for i in range(version, SCHEMA_VERSION):
+                for statement in MIGRATIONS[i].split(";"):
+                    conn.execute(statement)
+                logging.info("migrated %s to schema version %s", self.path, i + 1)
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def load(self):
+        """all stored answers that apply to this Python version, as a dict of
+        type name -> tuple of fields, including those not yet committed"""
+        rows = self.connection().execute(
+            """SELECT key, value FROM subfield_store
+            WHERE python_version IS NULL OR python_version = ?""",
+            (python_version(),),
+        )
+        table = {key: value for key, value in rows}
+        with self.lock:
+            table.update(self.pending)
+        return {
+            key: tuple(x for x in value.split(",") if x) for key, value in table.items()
+        }
+
+    def put(self, key: str, fields):
+        """queue the answer for type `key`, committing once a batch is full"""
+        with self.lock:
+            self.pending[key] = ",".join(fields)
+            full = len(self.pending) >= self.batch_size
+        if full:
+            self.flush()
+
+    def put_many(self, answers):
+        """commit the answers in `answers` (type name -> fields), together with
+        anything queued, in one transaction"""
+        with self.lock:
+            self.pending.update(
+                {key: ",".join(fields) for key, fields in answers.items()}
+            )
+        self.flush()
+
+    def flush(self):
+        """commit the queued answers in a single transaction"""
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        if not pending:
+            return
+        now = time.time()
+        conn = self.connection()
+        with metrics.timed("subfield_store.flush"):
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(
+                    UPSERT,
+                    [
+                        (key, value, python_version(), now)
+                        for key, value in pending.items()
+                    ],
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                with self.lock:
+                    self.pending = {**pending, **self.pending}
+                raise
+
+
+_SUBFIELD_STORE = None
+
+
+def get_subfield_store() -> SubfieldStore:
+    """the session subfield store configured under `subfield_store`, opened on
+    first use; queued answers are committed at exit"""
+    global _SUBFIELD_STORE
+    if _SUBFIELD_STORE is None:
+        config = dict(astound_config["subfield_store"])
+        config["path"] = cache_path(config["path"])
+        _SUBFIELD_STORE = SubfieldStore(**config)
+        atexit.register(_SUBFIELD_STORE.flush)
+    return _SUBFIELD_STORE
+
+
+def set_subfield_store(store: SubfieldStore):
+    global _SUBFIELD_STORE
+    _SUBFIELD_STORE = store
@@ -1,20 +1,30 @@
-import json
+import asyncio
+import functools
+from collections import namedtuple
 from types import MappingProxyType
 
-from astound import claude_model
+from astound import claude_model, max_concurrency, prompts
+from astound.chunking import chunk_core_text, estimate_tokens, pack, prompt_budget
+from astound.llm import asyncio_run, get_backend
 from astound.node import Node
+from astound.summary_cache import cache_key, get_summary_cache
 
-with open("data/prompts.json", "r", encoding="UTF-8") as f:
-    PROMPTS = MappingProxyType(json.load(f))
 
-MESSAGE_KWARGS = MappingProxyType(
-    {
-        "model": claude_model,
-        "max_tokens": 200,
-        "temperature": 0.0,
-        "system": PROMPTS["system_prompt"],
-    }
-)
+@functools.lru_cache(maxsize=None)
+def message_kwargs():
+    return MappingProxyType(
+        {
+            "model": claude_model,
+            "max_tokens": 200,
+            "temperature": 0.0,
+            "system": prompts()["system_prompt"],
+        }
+    )
+
+
+# kind is 'child' for the finished summary of the child at `key`, or 'text' for
+# a piece of the summary of the node itself
+SummaryEvent = namedtuple("SummaryEvent", ["kind", "key", "text"])
 
 
 def child_header(child):
@@ -23,6 +33,50 @@ def child_header(child):
     return "Here is information about a child.\n"
 
 
+def summary_key(core_text: str, child_summaries=()):
+    """cache key for the individual summary (no child summaries) or the joint
+    summary of a node, and for the partial summaries they are built from"""
+    return cache_key(core_text, child_summaries, claude_model, prompts())
+
+
+def child_parts(children, child_summaries):
+    return [
+        f"{child_header(child)}{child_summary}"
+        for child, child_summary in zip(children, child_summaries)
+    ]
+
+
+def build_joint_prompt(individual_summary, parts):
+    return prompts()["joint_header"] + individual_summary + "\n".join(parts)
+
+
+def chunk_prompt(chunk):
+    return prompts()["chunk_header"] + chunk, summary_key(chunk, ["chunk"])
+
+
+def merge_prompt(partials):
+    return (
+        prompts()["merge_header"] + "\n\n".join(partials),
+        summary_key("", ["merge", *partials]),
+    )
+
+
+def group_prompt(parts):
+    return (
+        prompts()["group_header"] + "\n".join(parts),
+        summary_key("", ["group", *parts]),
+    )
+
+
+GROUP_HEADER = "Here is information about several children.\n"
+
+
+def children_budget(individual_summary):
+    """tokens left in the joint prompt for the children"""
+    budget = prompt_budget()
+    return max(budget - estimate_tokens(individual_summary), budget // 2)
+
+
 def summarize(node: Node):
     """
     Args:
@@ -31,40 +85,241 @@ def summarize(node: Node):
     Returns:
         str: A summary of the node.
     """
-    client = Node.anthropic_client
+    return summarize_concurrent(node)
 
-    if len(node.summary) > 0:
-        return node.summary
 
-    individual_prompt = PROMPTS["individual_header"] + "".join(node.core_text())
+async def _create_async(backend, semaphore, prompt, key, label):
+    """issue a single messages request, holding a semaphore slot while it is sent"""
+    cached = get_summary_cache().get(key)
+    if cached is not None:
+        return cached
+    text = await backend.complete_async(
+        prompt, label=label, limiter=semaphore, **message_kwargs()
+    )
+    get_summary_cache().put(key, text)
+    return text
+
 
-    individual_summary = (
-        client.messages.create(
-            **MESSAGE_KWARGS, messages=[{"role": "user", "content": individual_prompt}]
+async def _reduce_async(parts, budget, combine):
+    """combine groups of parts that fit in budget until what is left fits; the
+    groups of a round run in parallel"""
+    while len(parts) > 1 and estimate_tokens("\n".join(parts)) > budget:
+        parts = await asyncio.gather(
+            *[
+                combine(group) if len(group) > 1 else _identity(group[0])
+                for group in pack(parts, budget)
+            ]
         )
-        .content[0]
-        .text
+    return list(parts)
+
+
+async def _identity(value):
+    return value
+
+
+async def _individual_async(backend, semaphore, core_text):
+    """
+    Individual summary of the output of `Node.core_text`. Text over the prompt
+    budget is split at statement boundaries, the chunks are summarized in
+    parallel and the partial summaries are merged.
+    """
+    chunks = chunk_core_text(core_text, prompt_budget())
+    if len(chunks) == 1:
+        return await _create_async(
+            backend,
+            semaphore,
+            prompts()["individual_header"] + chunks[0],
+            summary_key(chunks[0]),
+            "individual",
+        )
+
+    async def merge(group):
+        return await _create_async(backend, semaphore, *merge_prompt(group), "merge")
+
+    partials = await asyncio.gather(
+        *[
+            _create_async(backend, semaphore, *chunk_prompt(chunk), "chunk")
+            for chunk in chunks
+        ]
     )
+    partials = await _reduce_async(partials, prompt_budget(), merge)
+    return partials[0] if len(partials) == 1 else await merge(partials)
+
+
+async def _joint_parts_async(backend, semaphore, individual_summary, parts):
+    async def combine(group):
+        summary = await _create_async(backend, semaphore, *group_prompt(group), "group")
+        return GROUP_HEADER + summary
+
+    return await _reduce_async(parts, children_budget(individual_summary), combine)
+
+
+async def _summary_events(node: Node, backend, semaphore, stream: bool):
+    """
+    The summarization pipeline shared by `summarize_async` and
+    `summarize_stream_async`. Child subtrees are summarized alongside the
+    individual summary of node and reported as they finish; the final request
+    is then streamed piece by piece if stream is set, or made whole otherwise.
+
+    Yields:
+        SummaryEvent: one 'child' event per child, then 'text' events that
+        together make up node.summary.
+    """
+    if len(node.summary) > 0:
+        yield SummaryEvent("text", None, node.summary)
+        return
+
+    raw_core_text = node.core_text()
+    core_text = "".join(raw_core_text)
+    children = list(node.children.values())
 
-    if len(node.children) == 0:
-        node.summary = individual_summary
+    if len(children) == 0:
+        chunks = chunk_core_text(raw_core_text, prompt_budget())
+        if not stream or len(chunks) > 1:
+            # a merged summary has no single request to stream
+            summary = await _individual_async(backend, semaphore, raw_core_text)
+            node.record_summary(summary, core_text)
+            yield SummaryEvent("text", None, summary)
+            return
+        final_prompt, final_key, label = (
+            prompts()["individual_header"] + chunks[0],
+            summary_key(chunks[0]),
+            "individual",
+        )
     else:
-        joint_prompt = (
-            PROMPTS["joint_header"]
-            + individual_summary
-            + "\n".join(
-                [f"{child_header(x)}{summarize(x)}" for x in node.children.values()]
-            )
+        # the individual call does not depend on the children, so it is issued
+        # alongside the child subtrees rather than before them
+        individual_task = asyncio.ensure_future(
+            _individual_async(backend, semaphore, raw_core_text)
+        )
+
+        async def keyed_summary(key, child):
+            return key, await _summarize_async(child, backend, semaphore)
+
+        for finished in asyncio.as_completed(
+            [keyed_summary(key, child) for key, child in node.children.items()]
+        ):
+            key, child_summary = await finished
+            yield SummaryEvent("child", key, child_summary)
+
+        child_summaries = [child.summary for child in children]
+        individual_summary = await individual_task
+        parts = await _joint_parts_async(
+            backend,
+            semaphore,
+            individual_summary,
+            child_parts(children, child_summaries),
         )
+        final_prompt = build_joint_prompt(individual_summary, parts)
+        final_key, label = summary_key(core_text, child_summaries), "joint"
 
-        joint_summary = (
-            client.messages.create(
-                **MESSAGE_KWARGS, messages=[{"role": "user", "content": joint_prompt}]
-            )
-            .content[0]
-            .text
+    if not stream:
+        summary = await _create_async(
+            backend, semaphore, final_prompt, final_key, label
         )
+        node.record_summary(summary, core_text)
+        yield SummaryEvent("text", None, summary)
+        return
 
-        node.summary = joint_summary
+    pieces = []
+    async with semaphore:
+        async for piece in _stream_create_async(
+            backend, final_prompt, final_key, label
+        ):
+            pieces.append(piece)
+            yield SummaryEvent("text", None, piece)
+    node.record_summary("".join(pieces), core_text)
 
+
+async def _summarize_async(node: Node, backend, semaphore):
+    async for _ in _summary_events(node, backend, semaphore, stream=False):
+        pass
     return node.summary
+
+
+async def individual_summary_async(node: Node, semaphore: asyncio.Semaphore):
+    """summary of the core text of node alone, which goes into the summary cache
+    but is not recorded on the node"""
+    return await _individual_async(get_backend(), semaphore, node.core_text())
+
+
+async def summarize_async(
+    node: Node, max_concurrency: int = max_concurrency, semaphore=None
+):
+    """
+    Concurrent version of `summarize`. Sibling subtrees are summarized in
+    parallel and each joint call is issued as soon as the children of that
+    node have finished, so wall-clock time scales with the depth of the tree
+    rather than its size.
+
+    Args:
+        node (Node): The AST node to summarize.
+        max_concurrency (int): Maximum number of requests in flight at once.
+        semaphore (asyncio.Semaphore): Shared limit to use instead of
+            max_concurrency, for summarizing several trees at once.
+
+    Returns:
+        str: A summary of the node.
+    """
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(max_concurrency)
+    return await _summarize_async(node, get_backend(), semaphore)
+
+
+def summarize_concurrent(node: Node, max_concurrency: int = max_concurrency):
+    """blocking entry point for `summarize_async`"""
+    return asyncio_run(summarize_async(node, max_concurrency))
+
+
+async def _stream_create_async(backend, prompt, key, label):
+    """async generator over the pieces of a summary, served whole from the cache
+    when possible"""
+    cached = get_summary_cache().get(key)
+    if cached is not None:
+        yield cached
+        return
+    pieces = []
+    async for piece in backend.stream_async(prompt, label=label, **message_kwargs()):
+        pieces.append(piece)
+        yield piece
+    get_summary_cache().put(key, "".join(pieces))
+
+
+async def summarize_stream_async(node: Node, max_concurrency: int = max_concurrency):
+    """
+    Streaming version of `summarize_async`. Child subtrees are summarized
+    concurrently and reported as they finish; the summary of the node itself
+    is then streamed piece by piece as the model produces it.
+
+    Args:
+        node (Node): The AST node to summarize.
+        max_concurrency (int): Maximum number of requests in flight at once.
+
+    Yields:
+        SummaryEvent: one 'child' event per child, then 'text' events that
+        together make up node.summary.
+    """
+    events = _summary_events(
+        node, get_backend(), asyncio.Semaphore(max_concurrency), stream=True
+    )
+    try:
+        async for event in events:
+            yield event
+    finally:
+        await events.aclose()
+
+
+def summarize_stream(node: Node, max_concurrency: int = max_concurrency):
+    """blocking generator over the events of `summarize_stream_async`"""
+    loop = asyncio.new_event_loop()
+    events = summarize_stream_async(node, max_concurrency)
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(events.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        loop.run_until_complete(events.aclose())
+        loop.run_until_complete(get_backend().aclose())
+        loop.close()
@@ -0,0 +1,151 @@
+import atexit
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+
+from astound import astound_config, cache_path
+from astound.instrument import metrics
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS summary_cache (
+    key TEXT PRIMARY KEY,
+    summary TEXT,
+    size INTEGER,
+    created REAL,
+    accessed REAL
+);
+CREATE INDEX IF NOT EXISTS summary_cache_accessed ON summary_cache (accessed);
+"""
+
+
+def cache_key(core_text: str, child_summaries, model: str, prompts) -> str:
+    """content address of a summary: everything that can change the model's answer"""
+    payload = json.dumps(
+        {
+            "core_text": core_text,
+            "child_summaries": list(child_summaries),
+            "model": model,
+            "prompts": dict(prompts),
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SummaryCache:
+    """
+    Disk-backed, content-addressed store of summaries. Entries are evicted
+    least-recently-used first once the stored text exceeds `max_bytes`, and
+    unconditionally once they have not been read for `max_age_days`.
+
+    The total size is kept in memory, so the table is only scanned when it
+    goes over budget. Reads are recorded in memory and written with the next
+    `put` or `flush` rather than committed one by one.
+    """
+
+    def __init__(self, path: str, max_bytes: int, max_age_days: float):
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+        self.max_bytes = max_bytes
+        self.max_age = max_age_days * 86400
+        self.hits = 0
+        self.misses = 0
+        self.touched = {}  # key -> access time, not yet written
+        self.conn.execute(
+            "DELETE FROM summary_cache WHERE accessed < ?",
+            (time.time() - self.max_age,),
+        )
+        self.total = self.conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM summary_cache"
+        ).fetchone()[0]
+        self.evict()
+        self.conn.commit()
+
+    def get(self, key: str):
+        row = self.conn.execute(
+            "SELECT summary FROM summary_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            metrics.count("summary_cache.miss")
+            return None
+        self.hits += 1
+        metrics.count("summary_cache.hit")
+        self.touched[key] = time.time()
+        return row[0]
+
+    def put(self, key: str, summary: str):
+        now = time.time()
+        size = len(summary.encode("utf-8"))
+        row = self.conn.execute(
+            "SELECT size FROM summary_cache WHERE key = ?", (key,)
+        ).fetchone()
+        self.conn.execute(
+            """INSERT OR REPLACE INTO summary_cache (key, summary, size, created, accessed)
+            VALUES (?, ?, ?, ?, ?)""",
+            (key, summary, size, now, now),
+        )
+        self.total += size - (row[0] if row else 0)
+        self.touched.pop(key, None)
+        self.write_touched()
+        self.evict()
+        self.conn.commit()
+
+    def write_touched(self):
+        touched, self.touched = self.touched, {}
+        self.conn.executemany(
+            "UPDATE summary_cache SET accessed = ? WHERE key = ?",
+            [(accessed, key) for key, accessed in touched.items()],
+        )
+
+    def flush(self):
+        """write the access times of the summaries read since the last write"""
+        if self.touched:
+            self.write_touched()
+            self.conn.commit()
+
+    def evict(self):
+        """drop least recently used entries until under budget; the caller commits"""
+        if self.total <= self.max_bytes:
+            return
+        evicted = []
+        for key, size in self.conn.execute(
+            "SELECT key, size FROM summary_cache ORDER BY accessed"
+        ).fetchall():
+            if self.total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            self.total -= size
+        self.conn.executemany("DELETE FROM summary_cache WHERE key = ?", evicted)
+        logging.info("evicted %s summaries from cache", len(evicted))
+
+    def stats(self):
+        entries = self.conn.execute("SELECT COUNT(*) FROM summary_cache").fetchone()[0]
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": entries,
+            "bytes": self.total,
+        }
+
+
+_SUMMARY_CACHE = None
+
+
+def get_summary_cache() -> SummaryCache:
+    """the session summary cache configured under `summary_cache`, opened on
+    first use; access times of reads are written at exit"""
+    global _SUMMARY_CACHE
+    if _SUMMARY_CACHE is None:
+        config = dict(astound_config["summary_cache"])
+        config["path"] = cache_path(config["path"])
+        _SUMMARY_CACHE = SummaryCache(**config)
+        atexit.register(_SUMMARY_CACHE.flush)
+    return _SUMMARY_CACHE
+
+
+def set_summary_cache(cache: SummaryCache):
+    global _SUMMARY_CACHE
+    _SUMMARY_CACHE = cache
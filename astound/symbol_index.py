@@ -0,0 +1,268 @@
+import ast
+import logging
+import os
+import sqlite3
+
+from astound import astound_config, cache_path
+from astound.ast_index import DefinitionIndex
+from astound.inference import project_path
+from astound.instrument import metrics
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime REAL,
+    module TEXT,
+    root TEXT
+);
+CREATE TABLE IF NOT EXISTS symbols (
+    name TEXT,
+    path TEXT,
+    lineno INTEGER,
+    col_offset INTEGER,
+    end_lineno INTEGER,
+    end_col_offset INTEGER
+);
+CREATE INDEX IF NOT EXISTS symbols_path ON symbols (path);
+"""
+
+SKIP_DIRECTORIES = {
+    "__pycache__",
+    "build",
+    "dist",
+    "env",
+    "node_modules",
+    "site-packages",
+    "venv",
+}
+
+
+def skipped(directory: str):
+    """whether a directory of this name holds build output, installed packages
+    or an environment rather than project code"""
+    return (
+        directory in SKIP_DIRECTORIES
+        or directory[0] == "."
+        or directory.endswith(".egg-info")
+    )
+
+
+def python_files(directory: str):
+    """python files under directory, skipping hidden, build and environment
+    directories"""
+    paths = []
+    for parent, subdirectories, files in os.walk(directory):
+        subdirectories[:] = sorted(d for d in subdirectories if not skipped(d))
+        paths.extend(
+            os.path.join(parent, f) for f in sorted(files) if f.endswith(".py")
+        )
+    return paths
+
+
+def module_name(path: str):
+    """dotted module name under which the file at path is imported: its name
+    preceded by those of the enclosing directories that are packages, so that
+    e.g. src/pkg/b.py is 'pkg.b' when src/pkg has an __init__.py"""
+    directory, filename = os.path.split(os.path.abspath(path))
+    parts = [] if filename == "__init__.py" else [filename[: -len(".py")]]
+    while os.path.exists(os.path.join(directory, "__init__.py")):
+        directory, package = os.path.split(directory)
+        parts.append(package)
+    return ".".join(reversed(parts))
+
+
+def resolve_import(target: str, module: str, is_package: bool):
+    """absolute dotted name of an import target recorded by DefinitionIndex,
+    e.g. '.node.Source' imported in 'astound.cursor' -> 'astound.node.Source'"""
+    level = len(target) - len(target.lstrip("."))
+    if level == 0:
+        return target
+    package = module.split(".") if is_package else module.split(".")[:-1]
+    package = package[: len(package) - (level - 1)]
+    return ".".join([*package, target[level:]]).strip(".")
+
+
+def scan_file(path: str, module: str):
+    """
+    Read and index one file; runs in a worker process for large updates.
+
+    Returns:
+        tuple: path, mtime, module and a list of (qualified name, span).
+    """
+    mtime = os.path.getmtime(path)
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            tree = ast.parse(file.read())
+    except (SyntaxError, UnicodeDecodeError, ValueError) as exc:
+        logging.info("cannot index %s: %s", path, exc)
+        return path, mtime, module, []
+    index = DefinitionIndex()
+    index.visit(tree)
+    symbols = [
+        (f"{module}.{name}" if module else name, span)
+        for name, span in index.spans.items()
+    ]
+    return path, mtime, module, symbols
+
+
+def broad_roots():
+    """directories too broad to index, e.g. when run from the home directory"""
+    return {
+        os.path.realpath(os.path.expanduser("~")),
+        os.path.realpath(os.path.abspath(os.sep)),
+    }
+
+
+class SymbolIndex:
+    """
+    Project-wide map from qualified names such as 'astound.node.Source.load' to
+    the file and span that define them. Every python file under `root` is
+    indexed, and files outside it (e.g. the standard library) are added as
+    references to them are resolved. The index is stored in sqlite, shared
+    between projects but separated by root, and served from memory. A file is
+    re-indexed when its mtime changes, and large updates are spread over a
+    process pool. The index may be used from the prefetch worker thread, but
+    never from two threads at once.
+    """
+
+    def __init__(self, path: str, root: str, pool_threshold: int = 32):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+        self.root = os.path.realpath(root)
+        self.pool_threshold = pool_threshold
+        self.symbols = None  # qualified name -> (path, span), see `refresh`
+        self.files = {}  # path -> (mtime, module) of the indexed files
+
+    def refresh(self):
+        """bring the index up to date with the files under root"""
+        with metrics.timed("symbol_index.refresh"):
+            self.files = {
+                path: (mtime, module)
+                for path, mtime, module in self.conn.execute(
+                    "SELECT path, mtime, module FROM files WHERE root IN (?, '')",
+                    (self.root,),
+                )
+            }
+            if self.root in broad_roots():
+                logging.warning(
+                    "not indexing %s; run astound from within a project", self.root
+                )
+                paths = []
+            else:
+                paths = python_files(self.root)
+            modules = {path: module_name(path) for path in paths}
+            # a file is also re-indexed when a package around it was created
+            # or removed, which changes its module name
+            changed = [
+                path
+                for path in paths
+                if self.files.get(path) != (os.path.getmtime(path), modules[path])
+            ]
+            present = set(paths)
+            removed = [
+                path
+                for path in self.files
+                if path.startswith(self.root + os.sep) and path not in present
+            ]
+            jobs = [(path, modules[path]) for path in changed]
+            if len(jobs) >= self.pool_threshold:
+                # multiprocessing is slow to import and rarely needed after the
+                # first session in a project
+                from concurrent.futures import ProcessPoolExecutor
+
+                with ProcessPoolExecutor() as pool:
+                    results = list(pool.map(scan_file, *zip(*jobs), chunksize=16))
+            else:
+                results = [scan_file(*job) for job in jobs]
+            self.store(results, removed)
+
+            self.symbols = {}
+            for name, path, *span in self.conn.execute(
+                """SELECT symbols.* FROM symbols JOIN files USING (path)
+                WHERE files.root IN (?, '')""",
+                (self.root,),
+            ):
+                self.symbols.setdefault(name, (path, tuple(span)))
+        logging.info(
+            "symbol index: %s files re-indexed, %s removed", len(changed), len(removed)
+        )
+
+    def store(self, results, removed=()):
+        stale = [(path,) for path in removed] + [(r[0],) for r in results]
+        self.conn.executemany("DELETE FROM files WHERE path = ?", stale)
+        self.conn.executemany("DELETE FROM symbols WHERE path = ?", stale)
+        self.conn.executemany(
+            "INSERT INTO files VALUES (?, ?, ?, ?)",
+            [(*r[:3], self.root if self.module_of(r[0]) else "") for r in results],
+        )
+        self.conn.executemany(
+            "INSERT INTO symbols VALUES (?, ?, ?, ?, ?, ?)",
+            [(name, r[0], *span) for r in results for name, span in r[3]],
+        )
+        self.conn.commit()
+        for path in removed:
+            self.files.pop(path, None)
+        for path, mtime, module, _ in results:
+            self.files[path] = (mtime, module)
+
+    def index_file(self, path: str, module: str):
+        """(re-)index a single file, e.g. one outside root named by jedi"""
+        result = scan_file(path, module)
+        if self.symbols is not None:
+            self.symbols = {
+                name: hit for name, hit in self.symbols.items() if hit[0] != path
+            }
+            for name, span in result[3]:
+                self.symbols.setdefault(name, (path, span))
+        self.store([result])
+
+    def lookup(self, name: str):
+        """(path, span) of the definition named name, or None"""
+        if self.symbols is None:
+            self.refresh()
+        hit = self.symbols.get(name)
+        if hit is not None:
+            path = hit[0]
+            mtime, module = self.files[path]
+            if not os.path.exists(path):
+                hit = None
+            elif os.path.getmtime(path) != mtime:
+                self.index_file(path, module)
+                hit = self.symbols.get(name)
+        metrics.count("symbol_index.hit" if hit else "symbol_index.miss")
+        return hit
+
+    def module_of(self, path: str):
+        """dotted module name of a file under root, or None"""
+        path = os.path.realpath(path)
+        if not path.startswith(self.root + os.sep):
+            return None
+        return module_name(path)
+
+    def lookup_external(self, name: str, path: str, module: str):
+        """lookup name, first indexing the file at path as module if it is not
+        indexed yet, e.g. a standard library module that jedi resolved to"""
+        path = os.path.realpath(path)
+        if self.symbols is None:
+            self.refresh()
+        if path not in self.files and os.path.exists(path):
+            self.index_file(path, module)
+        return self.lookup(name)
+
+
+_SYMBOL_INDEX = None
+
+
+def get_symbol_index() -> SymbolIndex:
+    """the symbol index of the project that jedi works in, see `project_path`"""
+    global _SYMBOL_INDEX
+    if _SYMBOL_INDEX is None:
+        config = dict(astound_config["symbol_index"])
+        config["path"] = cache_path(config["path"])
+        _SYMBOL_INDEX = SymbolIndex(root=project_path(), **config)
+    return _SYMBOL_INDEX
+
+
+def set_symbol_index(index: SymbolIndex):
+    global _SYMBOL_INDEX
+    _SYMBOL_INDEX = index
@@ -0,0 +1,269 @@
+"""
+Benchmarks for tree building, navigation and summarization on large stdlib
+modules. Run from the repository root:
+
+    python -m benchmarks.run                    # report, compare to baseline
+    python -m benchmarks.run --save-baseline    # record a new baseline
+    python -m benchmarks.run --check            # exit 1 on regression
+
+Language model calls go to the offline stub backend and the summary and jedi
+caches are redirected to a temporary directory, so results do not depend on the
+network or on earlier runs.
+"""
+
+import argparse
+import ast
+import inspect
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import jedi
+
+from astound.ast_node_utils import skip_type
+from astound.cursor import Cursor
+from astound.inference import InferenceCache, set_inference_cache
+from astound.llm import StubBackend, set_backend
+from astound.node import Node, Source
+from astound.subfield_store import get_subfield_store
+from astound.summary_cache import SummaryCache, set_summary_cache
+from astound.symbol_index import SymbolIndex, set_symbol_index
+
+BASELINE_PATH = "benchmarks/baseline.json"
+MODULES = ("typing", "argparse")
+MAX_CALLS = 200  # Call nodes resolved per module by the core_text benchmark
+REGRESSION_FACTOR = 1.25
+
+
+class Counters:
+    """counts language model requests, sqlite statements and jedi inferences"""
+
+    def __init__(self):
+        self.backend = StubBackend(latency=0.01)
+        self.sqlite = 0
+        self.jedi = 0
+        set_backend(self.backend)
+
+        self.watch(get_subfield_store().connection())
+
+        jedi_infer = jedi.Script.infer
+
+        def counted_infer(script, *args, **kwargs):
+            self.jedi += 1
+            return jedi_infer(script, *args, **kwargs)
+
+        jedi.Script.infer = counted_infer
+
+    def count_statement(self, statement):
+        self.sqlite += 1
+
+    def watch(self, conn):
+        conn.set_trace_callback(self.count_statement)
+
+    def snapshot(self):
+        return {"llm": self.backend.calls, "sqlite": self.sqlite, "jedi": self.jedi}
+
+
+def fresh_caches(directory, counters):
+    """point the summary and inference caches and the symbol index at empty
+    databases"""
+    summary_cache = SummaryCache(
+        os.path.join(directory, f"summary_{time.time_ns()}.db"), 10**9, 30
+    )
+    inference_cache = InferenceCache(
+        os.path.join(directory, f"jedi_{time.time_ns()}.db")
+    )
+    symbol_index = SymbolIndex(
+        os.path.join(directory, f"symbols_{time.time_ns()}.db"), os.getcwd()
+    )
+    set_summary_cache(summary_cache)
+    set_inference_cache(inference_cache)
+    set_symbol_index(symbol_index)
+    counters.watch(summary_cache.conn)
+    counters.watch(inference_cache.conn)
+    counters.watch(symbol_index.conn)
+
+
+def rich_nodes(source):
+    return [
+        Node(ast_node, source=source)
+        for ast_node in ast.walk(source.tree)
+        if isinstance(ast_node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))
+    ]
+
+
+def bench_cursor(path):
+    Cursor(Source(path))
+
+
+def bench_split(path):
+    for node in rich_nodes(Source(path)):
+        list(node.split())
+
+
+def bench_print_unattached(path):
+    for node in rich_nodes(Source(path)):
+        node.print_unattached_subnodes()
+
+
+def bench_attach(path):
+    for node in rich_nodes(Source(path)):
+        for subnode, _ in list(node.split()):
+            try:
+                node.attach_subnode(
+                    subnode.ast_node.lineno, subnode.ast_node.col_offset
+                )
+            except (AttributeError, ValueError):
+                pass
+
+
+def bench_core_text(path):
+    source = Source(path)
+    calls = [x for x in ast.walk(source.tree) if isinstance(x, ast.Call)][:MAX_CALLS]
+    for call in calls:
+        Node(call, source=source).core_text()
+
+
+def attachable(node):
+    """components that keep an ast node after skip_type and have a position"""
+    for component, _ in node.split():
+        ast_node = component.ast_node
+        if hasattr(ast_node, "lineno") and skip_type(ast_node) is not None:
+            yield f"{ast_node.lineno},{ast_node.col_offset}", ast_node
+
+
+def bench_navigate(path):
+    """attach and visit each top-level definition, rendering the cursor after
+    every move as the interactive loop does"""
+    cursor = Cursor(Source(path))
+    repr(cursor)
+    for key, ast_node in list(attachable(cursor.root)):
+        if not isinstance(ast_node, (ast.FunctionDef, ast.ClassDef)):
+            continue
+        cursor.attach(line=ast_node.lineno, col=ast_node.col_offset)
+        repr(cursor)
+        cursor.down(key)
+        repr(cursor)
+        cursor.up()
+        repr(cursor)
+
+
+def bench_summarize(path):
+    cursor = Cursor(Source(path))
+    root = cursor.root
+    for key, ast_node in list(attachable(root))[:20]:
+        if key in root.children:
+            continue
+        root.attach_subnode(ast_node.lineno, ast_node.col_offset)
+        child = root.children[key]
+        for grandkey, grandchild in list(attachable(child))[:5]:
+            if grandkey not in child.children:
+                child.attach_subnode(grandchild.lineno, grandchild.col_offset)
+    cursor.summarize_down()
+
+
+BENCHMARKS = {
+    "cursor": bench_cursor,
+    "split": bench_split,
+    "print_unattached": bench_print_unattached,
+    "attach_subnode": bench_attach,
+    "navigate": bench_navigate,
+    "core_text": bench_core_text,
+    "summarize_down": bench_summarize,
+}
+
+
+def measure(function, path, counters, directory):
+    """time one run, then repeat it under tracemalloc for its allocation peak"""
+    fresh_caches(directory, counters)
+    before = counters.snapshot()
+    start = time.perf_counter()
+    function(path)
+    seconds = time.perf_counter() - start
+    after = counters.snapshot()
+
+    fresh_caches(directory, counters)
+    tracemalloc.start()
+    function(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = {"seconds": round(seconds, 4), "peak_kb": peak // 1024}
+    result.update({key: after[key] - before[key] for key in after})
+    return result
+
+
+def compare(results, baseline):
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        for metric in ("seconds", "peak_kb", "llm", "sqlite", "jedi"):
+            old, new = baseline[name][metric], result[metric]
+            if new > max(old * REGRESSION_FACTOR, old + 1):
+                regressions.append(f"{name} {metric}: {old} -> {new}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--check", action="store_true")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--only", nargs="*", choices=list(BENCHMARKS))
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.ERROR)
+
+    # prints from summarize_down are not part of the report
+    counters = Counters()
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for module in MODULES:
+            path = inspect.getsourcefile(__import__(module))
+            for name, function in BENCHMARKS.items():
+                if args.only and name not in args.only:
+                    continue
+                stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+                try:
+                    results[f"{module}.{name}"] = measure(
+                        function, path, counters, directory
+                    )
+                finally:
+                    sys.stdout.close()
+                    sys.stdout = stdout
+
+    header = f"{'benchmark':32}{'seconds':>10}{'peak_kb':>10}{'llm':>6}{'sqlite':>8}{'jedi':>6}"
+    print(header)
+    for name, r in results.items():
+        print(
+            f"{name:32}{r['seconds']:>10}{r['peak_kb']:>10}{r['llm']:>6}"
+            f"{r['sqlite']:>8}{r['jedi']:>6}"
+        )
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+        print(f"\nbaseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(
+            f"\nno baseline at {args.baseline}; run with --save-baseline to create one"
+        )
+        return 0
+
+    with open(args.baseline, "r", encoding="utf-8") as file:
+        regressions = compare(results, json.load(file))
+    if regressions:
+        print("\nregressions against baseline:\n  " + "\n  ".join(regressions))
+    else:
+        print("\nno regressions against baseline")
+    return 1 if regressions and args.check else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
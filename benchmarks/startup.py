@@ -0,0 +1,81 @@
+"""
+Import-time budget for astound. Each entry point is imported in a fresh
+interpreter, started outside the repository so that package-relative paths are
+exercised too, and must stay under the budget without pulling in the
+dependencies that are meant to load on first use:
+
+    python -m benchmarks.startup               # report, exit 1 over budget
+    python -m benchmarks.startup --budget-ms 150
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ENTRY_POINTS = ("astound", "astound.run", "astound.batch", "astound.session")
+DEFERRED_MODULES = ("jedi", "parso", "anthropic", "httpx")
+BUDGET_MS = 150
+REPEATS = 5
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps({{
+    "ms": 1000 * seconds,
+    "deferred": [m for m in {deferred!r} if m in sys.modules],
+}}))
+"""
+
+
+def probe(module: str, root: str):
+    """best-of-REPEATS import time in ms and the deferred modules it loaded"""
+    env = dict(os.environ, PYTHONPATH=root)
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for _ in range(REPEATS):
+            output = subprocess.run(
+                [
+                    sys.executable,
+                    "-c",
+                    PROBE.format(module=module, deferred=DEFERRED_MODULES),
+                ],
+                cwd=directory,
+                env=env,
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout
+            results.append(json.loads(output))
+    return min(r["ms"] for r in results), results[0]["deferred"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--budget-ms", type=float, default=BUDGET_MS)
+    args = parser.parse_args(argv)
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    failures = []
+    print(f"{'module':24}{'import ms':>10}  deferred modules loaded")
+    for module in ENTRY_POINTS:
+        ms, deferred = probe(module, root)
+        print(f"{module:24}{ms:>10.1f}  {', '.join(deferred) or '-'}")
+        if ms > args.budget_ms:
+            failures.append(f"{module} took {ms:.1f} ms (budget {args.budget_ms} ms)")
+        if deferred:
+            failures.append(f"{module} imported {', '.join(deferred)}")
+
+    if failures:
+        print("\nover budget:\n  " + "\n  ".join(failures))
+        return 1
+    print(f"\nall entry points import within {args.budget_ms} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,7 +9,7 @@ setup(
     long_description=open('README.md').read(),
     long_description_content_type='text/markdown',
     url='https://github.com/hollymandel/astound',
-    packages=find_packages(),
+    packages=find_packages(exclude=["benchmarks"]),
     install_requires=[
 #        'anthropic',
 #        'ast',
@@ -19,6 +19,6 @@ setup(
     python_requires='>=3.8',
     include_package_data=True,
     package_data={
-        'sample': ['data/*.json'],
+        'astound': ['config.json', 'data/*.json'],
     }
 )
@@ -0,0 +1,85 @@
+import os
+from collections import OrderedDict
+
+import pytest
+
+from astound import (
+    inference,
+    llm,
+    scheduler,
+    smartparse,
+    subfield_store,
+    summary_cache,
+    symbol_index,
+)
+from astound.llm import StubBackend
+from astound.registry import source_registry
+
+MAIN = """from util import helper
+
+
+def main():
+    return helper(1)
+"""
+
+UTIL = """def helper(x):
+    return x + 1
+"""
+
+MODULE = """def first(x):
+    return x + 1
+
+
+def second(x):
+    return first(x) * 2
+"""
+
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    """run each test in tmp_path, with caches under tmp_path/cache, the stub
+    backend, and fresh process-wide singletons that are restored afterwards"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("ASTOUND_CACHE_DIR", str(tmp_path / "cache"))
+    for module, name in [
+        (inference, "_PROJECT"),
+        (inference, "_INFERENCE_CACHE"),
+        (scheduler, "_SCHEDULER"),
+        (subfield_store, "_SUBFIELD_STORE"),
+        (summary_cache, "_SUMMARY_CACHE"),
+        (symbol_index, "_SYMBOL_INDEX"),
+    ]:
+        monkeypatch.setattr(module, name, None)
+    monkeypatch.setattr(llm, "_BACKEND", StubBackend())
+    monkeypatch.setattr(smartparse, "_SUBFIELD_TABLE", {})
+    monkeypatch.setattr(smartparse, "_REFINED_TYPES", set())
+    monkeypatch.setattr(source_registry, "sources", OrderedDict())
+
+
+@pytest.fixture
+def project(tmp_path):
+    """a project whose main.py calls a helper defined in util.py"""
+    (tmp_path / "main.py").write_text(MAIN)
+    (tmp_path / "util.py").write_text(UTIL)
+    return tmp_path
+
+
+@pytest.fixture
+def module_path(tmp_path):
+    """path of a module with two functions, the second calling the first"""
+    path = tmp_path / "module.py"
+    path.write_text(MODULE)
+    return path
+
+
+@pytest.fixture
+def rewrite():
+    """function writing text to a path and moving its mtime forward, so that
+    the change is seen even within the mtime resolution"""
+
+    def rewrite(path, text):
+        mtime = path.stat().st_mtime + 1
+        path.write_text(text)
+        os.utime(path, (mtime, mtime))
+
+    return rewrite
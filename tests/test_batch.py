@@ -0,0 +1,71 @@
+import asyncio
+import io
+import json
+
+from astound.batch import definition_tree, find_files, main, summarize_files
+from astound.node import Source
+
+NESTED = """class Outer:
+    def method(self):
+        def inner():
+            return 1
+
+        return inner()
+
+
+def function():
+    class Local:
+        pass
+
+    return Local
+"""
+
+
+def test_definition_tree_nests_definitions(tmp_path):
+    (tmp_path / "nested.py").write_text(NESTED)
+    root, named = definition_tree(Source(str(tmp_path / "nested.py")))
+
+    assert list(root.children) == ["1,0", "9,0"]
+    outer = root.children["1,0"]
+    assert list(outer.children) == ["2,4"]
+    assert list(outer.children["2,4"].children) == ["3,8"]
+    assert outer.children["2,4"].children["3,8"].parent is outer.children["2,4"]
+    assert list(named) == [
+        "Outer",
+        "Outer.method",
+        "Outer.method.inner",
+        "function",
+        "function.Local",
+    ]
+    assert named["function.Local"] is root.children["9,0"].children["10,4"]
+
+
+def test_failed_file_gets_error_record(tmp_path):
+    (tmp_path / "nested.py").write_text(NESTED)
+    (tmp_path / "broken.py").write_text("def broken(:\n")
+    paths = find_files(str(tmp_path))
+    out = io.StringIO()
+
+    failed = asyncio.run(summarize_files(paths, out, workers=1))
+
+    records = {r["path"]: r for r in map(json.loads, out.getvalue().splitlines())}
+    assert failed == 1
+    assert set(records) == set(paths)
+    assert records[str(tmp_path / "broken.py")]["error"].startswith("SyntaxError")
+    nested = records[str(tmp_path / "nested.py")]
+    assert nested["module"]
+    assert all(nested["definitions"].values())
+    assert len(nested["definitions"]) == 5
+
+
+def test_main_exit_status(tmp_path):
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "nested.py").write_text(NESTED)
+    out = str(tmp_path / "out.jsonl")
+
+    assert main([str(tmp_path / "src"), "--out", out, "--workers", "1"]) == 0
+
+    (tmp_path / "src" / "broken.py").write_text("def broken(:\n")
+    assert main([str(tmp_path / "src"), "--out", out, "--workers", "1"]) == 1
+    with open(out) as file:
+        assert len(file.readlines()) == 2
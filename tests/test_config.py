@@ -0,0 +1,17 @@
+import os
+
+from astound import cache_path, prompts
+
+
+def test_prompts_ship_with_the_package():
+    assert "system_prompt" in prompts()
+
+
+def test_cache_path_under_cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("ASTOUND_CACHE_DIR", str(tmp_path / "cache"))
+
+    path = cache_path("summary_cache.db")
+
+    assert path == str(tmp_path / "cache" / "summary_cache.db")
+    assert os.path.isdir(tmp_path / "cache")
+    assert cache_path(str(tmp_path / "elsewhere.db")) == str(tmp_path / "elsewhere.db")
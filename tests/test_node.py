@@ -0,0 +1,79 @@
+import pytest
+
+from astound.cursor import Cursor
+from astound.instrument import metrics
+from astound.node import Node, Source
+from astound.registry import source_registry
+
+MODULE = """class Base:
+    pass
+
+
+class Child(Base):
+    def method(self):
+        return super().method()
+
+
+def function():
+    return 1
+"""
+
+
+def test_inheritance_of_enclosing_class(tmp_path):
+    (tmp_path / "module.py").write_text(MODULE)
+    source = Source(str(tmp_path / "module.py"))
+    index = source.index
+
+    call = index.at(7, 15)[0]
+    assert Node.at_position(source, call).inheritance == "Base"
+    assert source.inheritance(index.at(1, 0)[0]) == ""
+    assert source.inheritance(index.at(10, 0)[0]) is None
+
+
+def test_failed_split_is_not_replayed(tmp_path, monkeypatch):
+    (tmp_path / "module.py").write_text(MODULE)
+    source = Source(str(tmp_path / "module.py"))
+    node = Node.at_position(source, source.index.at(10, 0)[0])
+    iter_split = Node.iter_split
+    calls = []
+
+    def failing_once(self, tag=" ", max_depth=2):
+        parts = iter_split(self, tag, max_depth)
+        if self is not node:
+            yield from parts
+            return
+        calls.append(tag)
+        yield next(parts)
+        if len(calls) == 1:
+            raise RuntimeError("interrupted")
+        yield from parts
+
+    monkeypatch.setattr(Node, "iter_split", failing_once)
+    split = node.split()
+    with pytest.raises(RuntimeError):
+        list(split)
+    assert split.failed and split.generator is None
+
+    complete = list(node.split())
+    assert len(complete) == 2
+    assert list(node.split()) == complete
+    assert len(calls) == 2
+
+
+def test_attach_renders_children_again(module_path):
+    cursor = Cursor(source_registry.get(str(module_path)))
+    root = cursor.root
+    before = str(cursor)
+    assert str(cursor) == before
+    assert metrics.counters["render.cache_hit"] > 0
+    assert "'first'" in root.print_unattached_subnodes()
+    assert root.print_children() == "   None"
+
+    cursor.attach(line=1, col=0)
+
+    assert "'first'" not in root.print_unattached_subnodes()
+    assert "'second'" in root.print_unattached_subnodes()
+    assert "at key '1,0'" in root.print_children()
+
+    cursor.attach(pathstr=str(module_path))
+    assert f"at key '{module_path}'" in root.print_children()
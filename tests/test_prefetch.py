@@ -0,0 +1,48 @@
+import asyncio
+import time
+
+import pytest
+
+from astound import prefetch
+from astound.cursor import Cursor
+from astound.llm import StubBackend, asyncio_run, set_backend
+from astound.registry import source_registry
+from astound.summarize import summarize_concurrent
+from astound.summary_cache import get_summary_cache
+
+
+@pytest.fixture
+def cursor(project):
+    cursor = Cursor(source_registry.get(str(project / "main.py")))
+    cursor.attach(line=4, col=0)
+    cursor.down("4,0")
+    return cursor
+
+
+def test_prefetch_summarizes_resolved_calls(cursor):
+    assert asyncio_run(prefetch.prefetch(cursor.current, 16, 6)) == 1
+
+    backend = StubBackend()
+    set_backend(backend)
+    cursor.attach(line=5, col=11)
+    summarize_concurrent(cursor.current.children["5,11"])
+    assert backend.calls == 0
+    assert get_summary_cache().stats()["hits"] > 0
+
+
+def test_cancelled_caller_waits_for_worker():
+    finished = []
+
+    def work():
+        time.sleep(0.1)
+        finished.append(True)
+
+    async def cancel():
+        task = asyncio.ensure_future(prefetch.off_loop(work))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return list(finished)
+
+    assert asyncio.run(cancel()) == [True]
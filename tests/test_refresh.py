@@ -0,0 +1,51 @@
+from astound import refresh
+from astound.cursor import Cursor
+from astound.registry import source_registry
+
+
+def test_refresh_after_callee_file_changed(project, rewrite):
+    cursor = Cursor(source_registry.get(str(project / "main.py")))
+    cursor.attach(line=4, col=0)
+    cursor.down("4,0")
+    cursor.attach(line=5, col=11)
+    call = cursor.current.children["5,11"]
+    cursor.up()
+    cursor.summarize_down(stream=False)
+    old_summary = call.summary
+    assert "x + 1" in "".join(call.core_text())
+
+    util = project / "util.py"
+    rewrite(util, util.read_text().replace("x + 1", "x * 2"))
+
+    refreshed = refresh.refresh(cursor.root)
+
+    assert refreshed == [cursor.root]
+    assert "x * 2" in "".join(call.core_text())
+    assert call.summary and call.summary != old_summary
+    assert not call.summary_inputs_changed()
+
+
+def test_refresh_without_changes(project):
+    cursor = Cursor(source_registry.get(str(project / "main.py")))
+    cursor.attach(line=4, col=0)
+    cursor.summarize_down(stream=False)
+
+    assert refresh.refresh(cursor.root) == []
+
+
+def test_refresh_renders_moved_nodes_again(module_path, rewrite):
+    cursor = Cursor(source_registry.get(str(module_path)))
+    cursor.attach(line=5, col=0)
+    cursor.down("5,0")
+    second = cursor.current
+    assert "at key '6, 11'" in second.print_unattached_subnodes()
+    cursor.up()
+    assert "at key '5,0'" in cursor.root.print_children()
+
+    rewrite(module_path, "import os\n\n" + module_path.read_text())
+    refresh.refresh(cursor.root)
+
+    assert "at key '7,0'" in cursor.root.print_children()
+    assert "at key '5,0'" not in cursor.root.print_children()
+    assert "'first' at key '3, 0'" in cursor.root.print_unattached_subnodes()
+    assert second.print_unattached_subnodes() == (second.render_unattached_subnodes())
@@ -0,0 +1,31 @@
+from astound.node import AST_NODE_BYTES
+from astound.registry import SourceRegistry
+
+
+def test_evict_releases_what_heavy_size_counts(tmp_path):
+    paths = []
+    for name in "ab":
+        (tmp_path / f"{name}.py").write_text("x = 1\n" * 100)
+        paths.append(str(tmp_path / f"{name}.py"))
+    registry = SourceRegistry(10**9)
+    first = registry.get(paths[0])
+    size = first.heavy_size()
+    assert size == len("x = 1") * 100 + len(first.index) * AST_NODE_BYTES
+
+    registry.max_loaded_bytes = size
+    registry.get(paths[1])
+
+    assert not first.loaded()
+    assert first.heavy_size() == 0
+    assert registry.loaded_bytes() == size
+    assert first.lines[0] == "x = 1"
+
+
+def test_new_mtime_replaces_stale_source(module_path, rewrite):
+    registry = SourceRegistry(10**9)
+    old = registry.get(module_path)
+    rewrite(module_path, "def first():\n    return 3\n")
+    new = registry.get(module_path)
+
+    assert new is not old
+    assert list(registry.sources.values()) == [new]
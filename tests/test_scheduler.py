@@ -0,0 +1,98 @@
+import asyncio
+import time
+
+import pytest
+
+from astound.scheduler import (
+    BACKGROUND,
+    Scheduler,
+    ThrottledError,
+    TransientError,
+    priority,
+)
+
+
+def test_slot_refuses_running_event_loop():
+    scheduler = Scheduler(max_concurrency=1)
+
+    async def blocking():
+        with scheduler.slot():
+            pass
+
+    with pytest.raises(RuntimeError, match="event loop"):
+        asyncio.run(blocking())
+    assert scheduler.active == 0
+
+
+def test_slot_async_after_blocking_slot():
+    scheduler = Scheduler(max_concurrency=1)
+    with scheduler.slot():
+        assert scheduler.active == 1
+
+    async def hold():
+        async with scheduler.slot_async():
+            return scheduler.active
+
+    assert asyncio.run(hold()) == 1
+    assert scheduler.active == 0
+
+
+def test_throttling_halves_limit_once_per_base_delay(monkeypatch):
+    scheduler = Scheduler(max_concurrency=8, base_delay=1.0)
+    now = [100.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+
+    scheduler.record(ThrottledError("rate limited"))
+    assert scheduler.limit == 4
+    # throttling reported by requests already in flight is the same event
+    scheduler.record(ThrottledError("rate limited"))
+    assert scheduler.limit == 4
+    now[0] += 1.0
+    scheduler.record(ThrottledError("rate limited"))
+    assert scheduler.limit == 2
+
+    scheduler.record(TransientError("server error"))
+    assert scheduler.limit == 2
+    scheduler.record(None)
+    assert scheduler.limit == 2.5
+
+
+def test_backoff_is_bounded():
+    scheduler = Scheduler(max_retries=6, base_delay=1.0, max_delay=10.0, seed=0)
+    error = TransientError("server error")
+    for attempt in range(6):
+        for _ in range(20):
+            delay = scheduler.backoff(error, attempt)
+            assert 0 <= delay <= min(10.0, 2**attempt)
+
+    assert scheduler.backoff(error, 6) is None
+    assert scheduler.backoff(ValueError("bad request"), 0) is None
+
+
+def test_backoff_waits_for_retry_after():
+    scheduler = Scheduler(base_delay=1.0, seed=0)
+
+    assert scheduler.backoff(ThrottledError("busy", retry_after=30.0), 0) == 30.0
+    assert scheduler.backoff(ThrottledError("busy", retry_after=0.0), 0) <= 1.0
+
+
+def test_interactive_waiters_served_first():
+    scheduler = Scheduler(max_concurrency=1)
+    order = []
+
+    async def request(name):
+        async with scheduler.slot_async():
+            order.append(name)
+
+    async def main():
+        async with scheduler.slot_async():
+            with priority(BACKGROUND):
+                first = asyncio.ensure_future(request("background"))
+            await asyncio.sleep(0)
+            second = asyncio.ensure_future(request("interactive"))
+            await asyncio.sleep(0)
+            assert len(scheduler.waiters) == 2
+        await asyncio.gather(first, second)
+
+    asyncio.run(main())
+    assert order == ["interactive", "background"]
@@ -0,0 +1,86 @@
+import os
+import shutil
+
+import pytest
+
+from astound import session
+from astound.cursor import Cursor
+from astound.registry import source_registry
+
+
+@pytest.fixture
+def saved(module_path, tmp_path):
+    cursor = Cursor(source_registry.get(str(module_path)))
+    cursor.attach(line=5, col=0)
+    cursor.down("5,0")
+    cursor.attach(line=6, col=11)
+    cursor.summarize_down(stream=False)
+    path = str(tmp_path / "saved.astound")
+    session.save(cursor, path)
+    return path
+
+
+def test_unchanged_session_keeps_summaries(saved):
+    cursor = session.load(saved)
+
+    assert cursor.current.name() == "second"
+    assert cursor.current.summary
+
+
+def test_inserted_line_moves_saved_nodes(saved, module_path, rewrite):
+    rewrite(module_path, "import math\n" + module_path.read_text())
+
+    cursor = session.load(saved)
+
+    assert cursor.current.name() == "second"
+    assert cursor.current.ast_node.lineno == 6
+    assert not cursor.current.summary
+    call = cursor.current.children["6,11"]
+    assert (call.ast_node.lineno, call.ast_node.col_offset) == (7, 11)
+
+
+def test_renamed_definition_line_is_found_by_name(saved, module_path, rewrite):
+    text = module_path.read_text().replace("def second(x):", "def second(x, y=0):")
+    rewrite(module_path, text)
+
+    cursor = session.load(saved)
+
+    assert cursor.current.name() == "second"
+
+
+def test_unreadable_source_is_dropped(module_path, tmp_path):
+    (tmp_path / "other.py").write_text("def other():\n    return 0\n")
+    cursor = Cursor(source_registry.get(str(module_path)))
+    cursor.attach(pathstr="other.py")
+    cursor.attach(line=1, col=0)
+    path = str(tmp_path / "saved.astound")
+    session.save(cursor, path)
+    os.remove(tmp_path / "other.py")
+
+    cursor = session.load(path)
+    print(cursor)
+
+    assert list(cursor.current.children) == ["1,0"]
+    with pytest.raises(KeyError):
+        cursor.down("other.py")
+
+
+def test_session_moves_with_the_project(tmp_path, monkeypatch):
+    one = tmp_path / "one"
+    one.mkdir()
+    (one / "pyproject.toml").write_text("")
+    (one / "module.py").write_text("def f():\n    return 1\n")
+    monkeypatch.chdir(one)
+    cursor = Cursor(source_registry.get("module.py"))
+    cursor.attach(line=1, col=0)
+    session.save(cursor, "saved.astound")
+
+    shutil.copytree(one, tmp_path / "two")
+    shutil.rmtree(one)
+    monkeypatch.chdir(tmp_path / "two")
+    cursor = session.load("saved.astound")
+
+    assert os.path.realpath(cursor.root.source.path) == os.path.realpath(
+        tmp_path / "two" / "module.py"
+    )
+    assert cursor.root.children["1,0"].name() == "f"
@@ -0,0 +1,147 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from astound.instrument import metrics
+from astound.singleflight import SingleFlight
+
+
+def run_waiters(flight, function, release, n=4):
+    """call flight.do from n threads at once and set release once all but the
+    leader wait for it; returns the results or exceptions, in thread order"""
+    outcomes = [None] * n
+    metrics.counters[f"{flight.name}.coalesced"] = 0
+
+    def call(i):
+        try:
+            outcomes[i] = flight.do("key", function)
+        except Exception as exc:
+            outcomes[i] = exc
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(n)]
+    for thread in threads:
+        thread.start()
+    while metrics.counters[f"{flight.name}.coalesced"] < n - 1:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+    return outcomes
+
+
+def test_do_coalesces_threads():
+    flight = SingleFlight("test")
+    release = threading.Event()
+    calls = []
+
+    def function():
+        calls.append(1)
+        release.wait()
+        return "result"
+
+    outcomes = run_waiters(flight, function, release)
+
+    assert outcomes == ["result"] * 4
+    assert len(calls) == 1
+    assert flight.calls == {}
+
+
+def test_do_shares_leader_error():
+    flight = SingleFlight("test")
+    release = threading.Event()
+    calls = []
+
+    def function():
+        calls.append(1)
+        release.wait()
+        raise ValueError("failed")
+
+    outcomes = run_waiters(flight, function, release)
+
+    assert all(isinstance(x, ValueError) for x in outcomes)
+    assert len(calls) == 1
+    # the key is forgotten, so the next call runs again
+    assert flight.do("key", lambda: "again") == "again"
+
+
+def test_do_async_coalesces_tasks():
+    flight = SingleFlight("test")
+    calls = []
+
+    async def function():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "result"
+
+    async def main():
+        return await asyncio.gather(
+            *[flight.do_async("key", function) for _ in range(4)]
+        )
+
+    assert asyncio.run(main()) == ["result"] * 4
+    assert len(calls) == 1
+    assert flight.futures == {}
+
+
+def test_do_async_shares_leader_error():
+    flight = SingleFlight("test")
+
+    async def function():
+        await asyncio.sleep(0.01)
+        raise ValueError("failed")
+
+    async def main():
+        return await asyncio.gather(
+            *[flight.do_async("key", function) for _ in range(3)],
+            return_exceptions=True,
+        )
+
+    outcomes = asyncio.run(main())
+    assert all(isinstance(x, ValueError) for x in outcomes)
+    assert flight.futures == {}
+
+
+def test_cancelled_leader_does_not_cancel_waiter():
+    flight = SingleFlight("test")
+    calls = []
+
+    async def function():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "result"
+
+    async def main():
+        leader = asyncio.ensure_future(flight.do_async("key", function))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(flight.do_async("key", function))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await waiter
+
+    assert asyncio.run(main()) == "result"
+    assert len(calls) == 2
+    assert flight.futures == {}
+
+
+def test_cancelled_waiter_does_not_cancel_call():
+    flight = SingleFlight("test")
+
+    async def function():
+        await asyncio.sleep(0.01)
+        return "result"
+
+    async def main():
+        leader = asyncio.ensure_future(flight.do_async("key", function))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(flight.do_async("key", function))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        return await leader
+
+    assert asyncio.run(main()) == "result"
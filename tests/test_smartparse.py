@@ -0,0 +1,59 @@
+import ast
+import asyncio
+
+import pytest
+
+from astound import astound_config, smartparse
+from astound.llm import get_backend
+from astound.node import Node, Source
+from astound.registry import SourceRegistry
+
+MODULE = """def double(x):
+    return [2 * y for y in x]
+"""
+
+
+@pytest.fixture
+def backend(tmp_path, monkeypatch):
+    (tmp_path / "module.py").write_text(MODULE)
+    monkeypatch.setitem(astound_config["smartparse"], "llm_refine", True)
+    return get_backend()
+
+
+def test_parse_makes_no_request(tmp_path, backend):
+    Source(str(tmp_path / "module.py"))
+
+    assert backend.calls == 0
+
+
+def test_registry_discovers_types_once(tmp_path, backend):
+    registry = SourceRegistry(10**9)
+    registry.get(str(tmp_path / "module.py"))
+    registry.get(str(tmp_path / "module.py"))
+
+    assert backend.calls == 1
+
+
+def test_no_blocking_request_on_event_loop(tmp_path, backend):
+    source = Source(str(tmp_path / "module.py"))
+
+    async def parse():
+        smartparse.discover_types(source.index)
+        return smartparse.parser_type_query(source.tree.body[0])
+
+    assert asyncio.run(parse()) == smartparse.static_fields(ast.FunctionDef)
+    assert backend.calls == 0
+
+    asyncio.run(smartparse.discover_types_async(source.index))
+    assert backend.calls == 1
+
+
+def test_static_fields_split_without_refinement(tmp_path):
+    (tmp_path / "module.py").write_text("x = f(y)\n")
+    source = Source(str(tmp_path / "module.py"))
+
+    assign = Node.at_position(source, source.index.at(1, 0)[0])
+    parts = [subnode.ast_node.id for subnode, _ in assign.split()]
+
+    assert smartparse.parser_type_query(assign.ast_node)[:2] == ("targets", "value")
+    assert parts == ["f", "y"]
@@ -0,0 +1,118 @@
+import multiprocessing
+import sqlite3
+import threading
+
+import pytest
+
+from astound.subfield_store import MIGRATIONS, SCHEMA_VERSION, SubfieldStore
+
+
+def columns(path):
+    with sqlite3.connect(path) as conn:
+        return [row[1] for row in conn.execute("PRAGMA table_info(subfield_store)")]
+
+
+def user_version(path):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def test_migrate_new_database(tmp_path):
+    path = str(tmp_path / "subfields.db")
+    SubfieldStore(path).put_many({"Call": ("func", "args")})
+
+    assert user_version(path) == SCHEMA_VERSION
+    assert "python_version" in columns(path)
+    assert SubfieldStore(path).load() == {"Call": ("func", "args")}
+
+
+def test_migrate_from_version_1(tmp_path):
+    path = str(tmp_path / "subfields.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute(MIGRATIONS[0])
+        conn.execute("INSERT INTO subfield_store VALUES ('Call', 'func,args')")
+        conn.execute("PRAGMA user_version = 1")
+
+    store = SubfieldStore(path)
+    # rows from before the migration apply to every Python version
+    assert store.load() == {"Call": ("func", "args")}
+    assert user_version(path) == SCHEMA_VERSION
+    assert columns(path) == ["key", "value", "python_version", "updated"]
+
+
+def test_concurrent_threads_on_one_key(tmp_path):
+    store = SubfieldStore(str(tmp_path / "subfields.db"), batch_size=1)
+    answers = [(f"field{i}",) for i in range(8)]
+    errors = []
+
+    def worker(fields):
+        try:
+            for _ in range(20):
+                store.put("Call", fields)
+                store.flush()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(x,)) for x in answers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert store.pending == {}
+    assert SubfieldStore(store.path).load()["Call"] in answers
+
+
+def put_in_process(path, i):
+    store = SubfieldStore(path)
+    for _ in range(20):
+        store.put_many({"Call": (f"field{i}",), f"Type{i}": ("body",)})
+
+
+def test_concurrent_processes_on_one_key(tmp_path):
+    path = str(tmp_path / "subfields.db")
+    SubfieldStore(path).load()  # created and migrated before the workers start
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=put_in_process, args=(path, i)) for i in range(4)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    assert [process.exitcode for process in processes] == [0] * 4
+    table = SubfieldStore(path).load()
+    assert table["Call"] in [(f"field{i}",) for i in range(4)]
+    assert {f"Type{i}" for i in range(4)} <= set(table)
+
+
+class FailingConnection:
+    """connection whose batched writes fail, as when the database is full"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, *args):
+        return self.conn.execute(*args)
+
+    def executemany(self, *args):
+        raise sqlite3.OperationalError("database or disk is full")
+
+
+def test_failed_flush_restores_pending(tmp_path, monkeypatch):
+    store = SubfieldStore(str(tmp_path / "subfields.db"))
+    store.put("Call", ("func", "args"))
+    conn = store.connection()
+    monkeypatch.setattr(store, "connection", lambda: FailingConnection(conn))
+
+    with pytest.raises(sqlite3.OperationalError):
+        store.flush()
+    assert store.pending == {"Call": "func,args"}
+    assert not conn.in_transaction
+
+    monkeypatch.undo()
+    store.put("Call", ("func",))
+    store.flush()
+    assert SubfieldStore(store.path).load() == {"Call": ("func",)}
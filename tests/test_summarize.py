@@ -0,0 +1,47 @@
+import pytest
+
+from astound import astound_config, summarize
+from astound.cursor import Cursor
+from astound.llm import StubBackend, set_backend
+from astound.registry import source_registry
+from astound.summary_cache import SummaryCache, set_summary_cache
+
+
+@pytest.fixture
+def cursor(module_path):
+    cursor = Cursor(source_registry.get(str(module_path)))
+    cursor.attach(line=1, col=0)
+    cursor.attach(line=5, col=0)
+    return cursor
+
+
+def clear_summaries(cursor):
+    root = cursor.root
+    root.summary = ""
+    for child in root.children.values():
+        child.summary = ""
+    return root
+
+
+def test_stream_matches_summarize(cursor):
+    summary = summarize.summarize(cursor.root)
+    set_summary_cache(SummaryCache(":memory:", 10**9, 30))
+    root = clear_summaries(cursor)
+
+    events = list(summarize.summarize_stream(root))
+
+    assert {event.key for event in events if event.kind == "child"} == {"1,0", "5,0"}
+    assert "".join(e.text for e in events if e.kind == "text") == summary
+    assert root.summary == summary
+
+
+def test_large_leaf_is_chunked_and_merged(cursor, monkeypatch):
+    monkeypatch.setitem(astound_config, "max_prompt_tokens", 4)
+    backend = StubBackend()
+    set_backend(backend)
+    leaf = cursor.root.children["1,0"]
+
+    summary = summarize.summarize(leaf)
+
+    assert summary == leaf.summary
+    assert backend.calls > 1
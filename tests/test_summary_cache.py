@@ -0,0 +1,69 @@
+import time
+
+import pytest
+
+from astound.summary_cache import SummaryCache
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "summaries.db")
+
+
+def test_hit_and_miss_counters(path):
+    cache = SummaryCache(path, max_bytes=10**6, max_age_days=30)
+    cache.put("a", "summary of a")
+
+    assert cache.get("a") == "summary of a"
+    assert cache.get("b") is None
+    assert cache.stats() == {
+        "hits": 1,
+        "misses": 1,
+        "entries": 1,
+        "bytes": len("summary of a"),
+    }
+
+
+def test_least_recently_read_evicted_first(path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    cache = SummaryCache(path, max_bytes=20, max_age_days=30)
+    for key in "abc":
+        now[0] += 1
+        cache.put(key, key * 6)
+    now[0] += 1
+    assert cache.get("a") == "aaaaaa"
+
+    now[0] += 1
+    cache.put("d", "dddddd")
+
+    assert cache.get("b") is None
+    assert [cache.get(key) for key in "acd"] == ["aaaaaa", "cccccc", "dddddd"]
+    assert cache.stats()["bytes"] == 18
+
+
+def test_size_survives_reopening(path):
+    cache = SummaryCache(path, max_bytes=10**6, max_age_days=30)
+    cache.put("a", "é" * 3)
+    cache.put("a", "é" * 5)
+    cache.conn.close()
+
+    assert SummaryCache(path, max_bytes=10**6, max_age_days=30).total == 10
+
+
+def test_unread_entries_expire(path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    cache = SummaryCache(path, max_bytes=10**6, max_age_days=1)
+    cache.put("a", "old")
+    cache.put("b", "read")
+    now[0] += 86400 * 0.75
+    cache.get("b")
+    cache.flush()
+    cache.conn.close()
+
+    now[0] += 86400 * 0.5
+    cache = SummaryCache(path, max_bytes=10**6, max_age_days=1)
+    assert cache.get("a") is None
+    assert cache.get("b") == "read"
+    assert cache.total == len("read")
@@ -0,0 +1,68 @@
+import os
+
+import pytest
+
+from astound.cursor import Cursor
+from astound.inference import project_path
+from astound.node import file_segment
+from astound.registry import source_registry
+from astound.symbol_index import module_name, python_files
+
+
+def test_python_files_skip_build_and_environments(tmp_path):
+    for directory in ["pkg", "build", "dist", "env", "pkg.egg-info", ".venv"]:
+        (tmp_path / directory).mkdir()
+        (tmp_path / directory / "module.py").write_text("x = 1\n")
+    (tmp_path / "env" / "site-packages").mkdir()
+
+    assert python_files(str(tmp_path)) == [str(tmp_path / "pkg" / "module.py")]
+
+
+def test_project_path_is_nearest_marked_directory(tmp_path, monkeypatch):
+    (tmp_path / "pyproject.toml").write_text("")
+    (tmp_path / "pkg" / "sub").mkdir(parents=True)
+    monkeypatch.chdir(tmp_path / "pkg" / "sub")
+
+    assert project_path() == str(tmp_path)
+
+
+def test_file_segment_follows_changes(tmp_path):
+    path = tmp_path / "module.py"
+    path.write_text("def f():\n    return 1\n")
+    assert file_segment(str(path), 1, 0, 2, 12) == "def f():\n    return 1"
+
+    path.write_text("def f():\n    return 22\n")
+    mtime = os.path.getmtime(path) + 1
+    os.utime(path, (mtime, mtime))
+    assert file_segment(str(path), 1, 0, 2, 13) == "def f():\n    return 22"
+
+
+@pytest.fixture
+def src_layout(tmp_path):
+    (tmp_path / "pyproject.toml").write_text("")
+    package = tmp_path / "src" / "pkg"
+    package.mkdir(parents=True)
+    (package / "__init__.py").write_text("")
+    (package / "a.py").write_text(
+        "from pkg.b import helper\n\n\ndef main():\n    return helper(1)\n"
+    )
+    (package / "b.py").write_text("def helper(x):\n    return x + 1\n")
+    return tmp_path
+
+
+def test_module_name_follows_packages(src_layout):
+    assert module_name(str(src_layout / "src" / "pkg" / "b.py")) == "pkg.b"
+    assert module_name(str(src_layout / "src" / "pkg" / "__init__.py")) == "pkg"
+
+
+@pytest.mark.parametrize("cwd", [".", "src"])
+def test_follow_import_in_src_layout(src_layout, monkeypatch, cwd):
+    monkeypatch.chdir(src_layout / cwd)
+    cursor = Cursor(source_registry.get(str(src_layout / "src" / "pkg" / "a.py")))
+    cursor.attach(line=4, col=0)
+    cursor.down("4,0")
+
+    cursor.follow(5, 11)
+
+    assert cursor.current.name() == "helper"
+    assert cursor.current.source.path.endswith(os.path.join("pkg", "b.py"))